@@ -1,39 +1,164 @@
+import base64
+import itertools
+import json
+import logging
+import time
 import uuid
-from typing import List
-from fastapi import APIRouter, Depends, UploadFile, File
-from sqlalchemy.orm import Session
-from app.db.session import get_db
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import and_, case, func, insert, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
+from app.db.session import get_db, SessionLocal
 from app.db import models
 from app.schemas import dtos
 from app.core.config import settings
+from app.core.metrics import current_endpoint
 from app.services.ingestion import ingestion_service
-from app.services.generator import generator_service
+from app.services.generator import generator_service, DIFFICULTIES
 from app.services.report import report_service
-from app.core.exceptions import ConfigurationError, SessionExpiredError
+from app.services.export import ExportFilters, export_service
+from app.services.jobs import Job, job_queue
+from app.services.question_bank import question_bank_service
+from app.services.scheduler import AttemptScheduler
+from app.core.exceptions import AIModelError, ConfigurationError, SessionExpiredError
 
-router = APIRouter()
+logger = logging.getLogger(__name__)
+
+async def _track_endpoint(request: Request):
+    # Async so it runs in the request's context; sync handlers then inherit it in the threadpool
+    current_endpoint.set(request.scope["route"].path)
+
+router = APIRouter(dependencies=[Depends(_track_endpoint)])
+
+def _register_file(db: Session, file_hash: str, filename: str, file_path: Path, progress=None) -> models.UploadedFile:
+    # Title and sample are computed once per file_hash; every later lookup is by primary key
+    index_path, sample_text = ingestion_service.create_index(file_hash, file_path, progress)
+    record = models.UploadedFile(
+        file_hash=file_hash, filename=filename, index_path=index_path, sample_text=sample_text,
+        title=ingestion_service.generate_title(sample_text, fallback=Path(filename).stem)
+    )
+    db.add(record)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another worker registered the same file while this one was indexing and titling; its row wins
+        db.rollback()
+        record = db.get(models.UploadedFile, file_hash)
+    return record
+
+def _ingest_job(job: Job, file_hash: str, filename: str, file_path: Path):
+    db = SessionLocal()
+    try:
+        if db.get(models.UploadedFile, file_hash): return
+        job.update("indexing", 0.05)
+        # Parsing and embedding cover 5-90%; titling and the DB row take the rest
+        _register_file(db, file_hash, filename, file_path, progress=lambda stage, done: job.update(stage, 0.05 + 0.85 * done))
+        question_bank_service.schedule_replenish(file_hash)
+    finally:
+        db.close()
 
 @router.post("/upload", response_model=dtos.FileUploadResponse)
-async def upload_file(file: UploadFile = File(...)):
-    content = await file.read()
-    file_hash, file_path = ingestion_service.validate_and_save(file.filename, content)
-    ingestion_service.create_index(file_hash, file_path)
-    return dtos.FileUploadResponse(file_hash=file_hash, filename=file.filename, message="Success")
+async def upload_file(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    # UploadFile is spooled to disk by Starlette; read it in chunks off the event loop
+    file_hash, file_path = await run_in_threadpool(ingestion_service.save_stream, file.filename, file.file)
+    if db.get(models.UploadedFile, file_hash):
+        return dtos.FileUploadResponse(file_hash=file_hash, filename=file.filename, message="Success")
+
+    # Indexing runs on the job pool; a second upload of the same hash attaches to the in-flight job
+    job = job_queue.submit("ingest", file_hash, lambda job: _ingest_job(job, file_hash, file.filename, file_path))
+    return dtos.FileUploadResponse(
+        file_hash=file_hash, filename=file.filename, message="Indexing started",
+        status=job.status, job_id=job.id
+    )
+
+@router.get("/upload/status/{job_id}", response_model=dtos.IngestionJobStatus)
+def upload_status(job_id: str):
+    job = job_queue.get(job_id)
+    if not job: raise HTTPException(status_code=404, detail="Job not found.")
+    return dtos.IngestionJobStatus(
+        job_id=job.id, file_hash=job.key, status=job.status,
+        stage=job.stage, progress=job.progress, error=job.error
+    )
+
+def _resolve_document(db: Session, file_hash: str):
+    index = ingestion_service.get_index(file_hash)
+    if not index:
+        if job_queue.active("ingest", file_hash): raise ConfigurationError("Document is still being indexed.")
+        raise ConfigurationError("Index not found.")
+
+    record = db.get(models.UploadedFile, file_hash)
+    if not record:
+        # Files uploaded before titles were persisted get their row on first use
+        file_path = ingestion_service.find_upload(file_hash)
+        if not file_path: raise ConfigurationError("Uploaded file not found.")
+        record = _register_file(db, file_hash, file_path.name, file_path)
+    return index, record
+
+def _question_fields(session_id: str, q_data: dict) -> dict:
+    # CRITICAL FIX: Ensure reference_context is always a string
+    ref = q_data.get('reference_context', "")
+    if isinstance(ref, dict):
+        ref = str(ref)
+
+    return dict(
+        session_id=session_id,
+        question_text=q_data['question_text'],
+        options=q_data['options'],
+        correct_answer=q_data['correct_answer'],
+        difficulty=q_data['difficulty'],
+        explanation=q_data['explanation'],
+        reference_context=ref
+    )
+
+def _question_row(session_id: str, q_data: dict) -> models.Question:
+    return models.Question(**_question_fields(session_id, q_data))
+
+def _question_dto(q_obj: models.Question) -> dtos.QuestionBase:
+    return dtos.QuestionBase(
+        id=q_obj.id, question_text=q_obj.question_text,
+        options=q_obj.options, difficulty=q_obj.difficulty
+    )
+
+def _insert_questions(db: Session, session_id: str, raw_questions: List[dict]) -> List[dtos.QuestionBase]:
+    # One multi-row INSERT ... RETURNING instead of a flush per question just to learn its id
+    rows = [_question_fields(session_id, q_data) for q_data in raw_questions]
+    if not rows: return []
+    ids = db.scalars(
+        insert(models.Question).returning(models.Question.id, sort_by_parameter_order=True), rows
+    ).all()
+    return [
+        dtos.QuestionBase(id=q_id, question_text=row['question_text'], options=row['options'], difficulty=row['difficulty'])
+        for q_id, row in zip(ids, rows)
+    ]
 
 @router.post("/generate", response_model=dtos.SessionResponse)
 def generate_quiz(config: dtos.QuizConfig, db: Session = Depends(get_db)):
-    index = ingestion_service.get_index(config.file_hash)
-    if not index: raise ConfigurationError("Index not found.")
-
-    file_ext = ""
-    for ext in [".pdf", ".docx", ".pptx", ".txt"]:
-        if (settings.UPLOAD_DIR / f"{config.file_hash}{ext}").exists():
-            file_ext = ext
-            break
-    
-    file_path = settings.UPLOAD_DIR / f"{config.file_hash}{file_ext}"
-    test_name = ingestion_service.generate_title(file_path)
-    raw_questions = generator_service.generate_quiz(index, config)
+    started = time.monotonic()
+    index, record = _resolve_document(db, config.file_hash)
+    test_name = record.title or "Assessment"
+
+    # Serve from the pre-generated bank first; live generation only covers the shortfall
+    banked, shortfall = question_bank_service.draw(db, config.file_hash, generator_service.quiz_counts(config))
+    live, outcome = [], {"status": "COMPLETE", "reason": None}
+    if any(getattr(shortfall, diff) for diff in DIFFICULTIES):
+        # The deadline covers the whole request, so time spent resolving and drawing counts against it
+        deadline = settings.GENERATION_DEADLINE_SECONDS
+        scheduler = AttemptScheduler(shortfall, deadline=max(deadline - (time.monotonic() - started), 0.001) if deadline else None)
+        try:
+            live = generator_service.generate_questions(
+                index, shortfall, dedup=question_bank_service.dedup_index(db, config.file_hash, banked), scheduler=scheduler
+            )
+            outcome = scheduler.summary()
+        except AIModelError as e:
+            if not banked: raise
+            outcome = {"status": "PARTIAL", "reason": e.detail}
+        shortfall = scheduler.shortfall()
+    raw_questions = sorted(banked + live, key=lambda q: DIFFICULTIES.index(q['difficulty']))
     
     session_id = str(uuid.uuid4())
     db_session = models.QuizSession(
@@ -41,45 +166,119 @@ def generate_quiz(config: dtos.QuizConfig, db: Session = Depends(get_db)):
         config=config.dict(), status="ACTIVE"
     )
     db.add(db_session)
-    
-    ui_questions = []
-    for q_data in raw_questions:
-        # CRITICAL FIX: Ensure reference_context is always a string
-        ref = q_data.get('reference_context', "")
-        if isinstance(ref, dict):
-            ref = str(ref)
-
-        q_obj = models.Question(
-            session_id=session_id,
-            question_text=q_data['question_text'],
-            options=q_data['options'],
-            correct_answer=q_data['correct_answer'],
-            difficulty=q_data['difficulty'],
-            explanation=q_data['explanation'],
-            reference_context=ref 
-        )
-        db.add(q_obj)
-        db.flush() 
-        
-        ui_questions.append(dtos.QuestionBase(
-            id=q_obj.id, question_text=q_obj.question_text,
-            options=q_obj.options, difficulty=q_obj.difficulty
-        ))
-    
+    db.flush()
+    ui_questions = _insert_questions(db, session_id, raw_questions)
     db.commit()
-    return dtos.SessionResponse(session_id=session_id, test_name=test_name, questions=ui_questions)
+    if question_bank_service.needs_refill(db, config.file_hash):
+        question_bank_service.schedule_replenish(config.file_hash)
+    return dtos.SessionResponse(
+        session_id=session_id, test_name=test_name, questions=ui_questions,
+        status=outcome["status"], reason=outcome["reason"],
+        shortfall=shortfall if outcome["status"] == "PARTIAL" else None
+    )
+
+@router.post("/generate/stream")
+def generate_quiz_stream(config: dtos.QuizConfig, db: Session = Depends(get_db)):
+    """NDJSON stream: a "session" event, one "question" event per persisted question, then "done" or "error"."""
+    index, record = _resolve_document(db, config.file_hash)
+    test_name = record.title or "Assessment"
+
+    session_id = str(uuid.uuid4())
+    db.add(models.QuizSession(
+        id=session_id, file_hash=config.file_hash, test_name=test_name,
+        config=config.dict(), status="ACTIVE"
+    ))
+    banked, shortfall = question_bank_service.draw(db, config.file_hash, generator_service.quiz_counts(config))
+    db.commit()
+    dedup = question_bank_service.dedup_index(db, config.file_hash, banked) if any(getattr(shortfall, diff) for diff in DIFFICULTIES) else None
+    # No deadline here: a stream delivers progress as it goes, so only the attempt budget bounds it
+    scheduler = AttemptScheduler(shortfall)
+
+    def events():
+        # The request-scoped session is not guaranteed to outlive the handler, so the stream owns its own
+        stream_db = SessionLocal()
+        emitted = 0
+        try:
+            yield json.dumps({"type": "session", "session_id": session_id, "test_name": test_name}) + "\n"
+            for q_data in itertools.chain(banked, generator_service.iter_questions(index, shortfall, dedup, scheduler)):
+                q_obj = _question_row(session_id, q_data)
+                stream_db.add(q_obj)
+                stream_db.commit()
+                emitted += 1
+                yield json.dumps({"type": "question", "question": _question_dto(q_obj).dict()}) + "\n"
+            if not emitted: raise AIModelError("The AI failed to generate any valid questions from this document.")
+            outcome = scheduler.summary()
+            yield json.dumps({
+                "type": "done", "session_id": session_id, "count": emitted, "status": outcome["status"], "reason": outcome["reason"],
+                "shortfall": scheduler.shortfall().dict() if outcome["status"] == "PARTIAL" else None
+            }) + "\n"
+        except HTTPException as e:
+            if not emitted:
+                stream_db.query(models.QuizSession).filter(models.QuizSession.id == session_id).delete()
+                stream_db.commit()
+            yield json.dumps({"type": "error", "detail": e.detail, "count": emitted}) + "\n"
+        except Exception:
+            # Anything else (database error, generator bug) must still end the stream with an explicit error event
+            logger.exception("Question stream for session %s failed after %d question(s)", session_id, emitted)
+            stream_db.rollback()
+            if not emitted:
+                try:
+                    stream_db.query(models.QuizSession).filter(models.QuizSession.id == session_id).delete()
+                    stream_db.commit()
+                except Exception:
+                    stream_db.rollback()
+            yield json.dumps({"type": "error", "detail": "Question generation failed unexpectedly.", "count": emitted}) + "\n"
+        finally:
+            if question_bank_service.needs_refill(stream_db, config.file_hash):
+                question_bank_service.schedule_replenish(config.file_hash)
+            stream_db.close()
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@router.get("/index/cache")
+def index_cache_stats():
+    return ingestion_service.index_cache.stats()
+
+HISTORY_STATUSES = ("COMPLETED", "AUTO_SUBMITTED")
+
+def _encode_cursor(created_at, session_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([created_at.isoformat(), session_id]).encode()).decode()
+
+def _decode_cursor(cursor: str):
+    try:
+        created_at, session_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), session_id
+    except Exception:
+        raise ConfigurationError("Invalid history cursor.")
 
 @router.get("/history", response_model=dtos.HistoryResponse)
-def get_history(db: Session = Depends(get_db)):
-    sessions = db.query(models.QuizSession).order_by(models.QuizSession.created_at.desc()).all()
+def get_history(
+    cursor: Optional[str] = None, limit: int = Query(20, ge=1, le=100),
+    status: Optional[str] = None, db: Session = Depends(get_db)
+):
+    # In-progress sessions are not history; only finished statuses may be asked for
+    if status and status not in HISTORY_STATUSES:
+        raise ConfigurationError(f"Unknown history status '{status}'. Use one of: {', '.join(HISTORY_STATUSES)}.")
+    # Only the HistoryItem columns; keyset on (created_at, id) so deep pages cost the same as the first
+    QS = models.QuizSession
+    query = db.query(
+        QS.id, QS.test_name, QS.accuracy, QS.total_score, QS.max_score,
+        QS.created_at, QS.difficulty_stats, QS.status
+    ).filter(QS.status.in_([status] if status else HISTORY_STATUSES))
+    if cursor:
+        created_at, session_id = _decode_cursor(cursor)
+        query = query.filter(or_(QS.created_at < created_at, and_(QS.created_at == created_at, QS.id < session_id)))
+    rows = query.order_by(QS.created_at.desc(), QS.id.desc()).limit(limit + 1).all()
+
     history_items = [
         dtos.HistoryItem(
             session_id=s.id, test_name=s.test_name or "Assessment",
             accuracy=s.accuracy, total_score=s.total_score, max_score=s.max_score,
             created_at=s.created_at, difficulty_stats=s.difficulty_stats or {}, status=s.status
-        ) for s in sessions if s.status != "ACTIVE"
+        ) for s in rows[:limit]
     ]
-    return dtos.HistoryResponse(attempts=history_items)
+    next_cursor = _encode_cursor(rows[limit - 1].created_at, rows[limit - 1].id) if len(rows) > limit else None
+    return dtos.HistoryResponse(attempts=history_items, next_cursor=next_cursor)
 
 @router.get("/history/{session_id}", response_model=dtos.ResultResponse)
 def get_session_detail(session_id: str, db: Session = Depends(get_db)):
@@ -92,25 +291,51 @@ def get_session_detail(session_id: str, db: Session = Depends(get_db)):
         report_url=f"/api/report/download/{session.id}"
     )
 
-@router.post("/proctor/log")
-def log_violation(payload: dtos.ProctorIncident, db: Session = Depends(get_db)):
-    session = db.query(models.QuizSession).filter(models.QuizSession.id == payload.session_id).first()
-    if not session or session.status != "ACTIVE": raise SessionExpiredError()
-    log = models.ProctorLog(session_id=payload.session_id, violation_type=payload.violation_type)
-    db.add(log)
-    count = db.query(models.ProctorLog).filter(models.ProctorLog.session_id == payload.session_id).count()
-    if count >= 3: session.status = "AUTO_SUBMITTED"
+@router.get("/export")
+def export_results(
+    fmt: str = Query("ndjson", alias="format"), rows: str = "questions",
+    date_from: Optional[datetime] = None, date_to: Optional[datetime] = None,
+    file_hash: Optional[str] = None, status: Optional[str] = None
+):
+    """Streams every matching session: NDJSON nests questions, responses and proctor logs; CSV/Parquet are flat `rows`."""
+    media_type, chunks = export_service.open(fmt, rows, ExportFilters(date_from, date_to, file_hash, status))
+    filename = f"quiz_export_{datetime.utcnow():%Y%m%d_%H%M%S}.{fmt}"
+    return StreamingResponse(chunks, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+def _record_violations(db: Session, session_id: str, violation_types: List[str]) -> dtos.ProctorLogResponse:
+    # One conditional UPDATE ... RETURNING bumps the counter and trips the threshold; no session load, no COUNT(*)
+    QS = models.QuizSession
+    new_count = func.coalesce(QS.violation_count, 0) + len(violation_types)
+    row = db.execute(
+        update(QS).where(QS.id == session_id, QS.status == "ACTIVE").values(
+            violation_count=new_count,
+            status=case((new_count >= settings.PROCTOR_MAX_VIOLATIONS, "AUTO_SUBMITTED"), else_=QS.status)
+        ).returning(QS.violation_count, QS.status).execution_options(synchronize_session=False)
+    ).first()
+    if not row: raise SessionExpiredError()
+    db.execute(insert(models.ProctorLog), [{"session_id": session_id, "violation_type": v} for v in violation_types])
     db.commit()
-    return {"status": "logged", "violation_count": count}
+    return dtos.ProctorLogResponse(status="logged", violation_count=row.violation_count, session_status=row.status)
+
+@router.post("/proctor/log", response_model=dtos.ProctorLogResponse)
+def log_violation(payload: dtos.ProctorIncident, db: Session = Depends(get_db)):
+    return _record_violations(db, payload.session_id, [payload.violation_type])
+
+@router.post("/proctor/log/batch", response_model=dtos.ProctorLogResponse)
+def log_violations(payload: dtos.ProctorIncidentBatch, db: Session = Depends(get_db)):
+    if not payload.violation_types or len(payload.violation_types) > settings.PROCTOR_MAX_BATCH:
+        raise ConfigurationError(f"A batch must contain between 1 and {settings.PROCTOR_MAX_BATCH} incidents.")
+    return _record_violations(db, payload.session_id, payload.violation_types)
 
 @router.post("/submit", response_model=dtos.ResultResponse)
 def submit_quiz(payload: dtos.QuizSubmission, db: Session = Depends(get_db)):
-    session = db.query(models.QuizSession).filter(models.QuizSession.id == payload.session_id).first()
+    session = db.query(models.QuizSession).options(selectinload(models.QuizSession.questions)).filter(models.QuizSession.id == payload.session_id).first()
     if not session: raise SessionExpiredError()
     questions = {q.id: q for q in session.questions}
     total_correct = 0
     max_score = len(session.questions)
     diff_stats = {"easy": {"score": 0, "total": 0}, "medium": {"score": 0, "total": 0}, "hard": {"score": 0, "total": 0}}
+    responses = []
     for ans in payload.answers:
         q = questions.get(ans.question_id)
         if not q: continue
@@ -118,23 +343,29 @@ def submit_quiz(payload: dtos.QuizSubmission, db: Session = Depends(get_db)):
         if is_correct: total_correct += 1
         diff_stats[q.difficulty]["total"] += 1
         if is_correct: diff_stats[q.difficulty]["score"] += 1
-        db.add(models.StudentResponse(session_id=session.id, question_id=q.id, selected_answer=ans.selected_answer, is_correct=is_correct))
+        responses.append(dict(session_id=session.id, question_id=q.id, selected_answer=ans.selected_answer, is_correct=is_correct))
+    if responses: db.execute(insert(models.StudentResponse), responses)
     session.accuracy = (total_correct / max_score * 100) if max_score > 0 else 0
     session.total_score, session.max_score = float(total_correct), float(max_score)
     session.status = "COMPLETED" if session.status == "ACTIVE" else session.status
     session.completed_at, session.difficulty_stats = models.datetime.utcnow(), {k: v for k, v in diff_stats.items() if v["total"] > 0}
     db.commit()
-    report_path = report_service.generate_quiz_report(
-        {"id": session.id, "test_name": session.test_name, "total_score": session.total_score, "max_score": session.max_score, "accuracy": session.accuracy, "status": session.status},
-        session.questions, session.responses, session.proctor_logs
-    )
-    session.pdf_report_path = report_path
-    db.commit()
+    # Scores go back now; the PDF renders in the background (or on first download, whichever comes first)
+    report_service.schedule(session.id)
     return dtos.ResultResponse(session_id=session.id, test_name=session.test_name, total_score=session.total_score, max_score=session.max_score, accuracy=session.accuracy, difficulty_breakdown=session.difficulty_stats, report_url=f"/api/report/download/{session.id}")
 
 @router.get("/report/download/{session_id}")
-def download_report(session_id: str, db: Session = Depends(get_db)):
-    from fastapi.responses import FileResponse
-    session = db.query(models.QuizSession).filter(models.QuizSession.id == session_id).first()
-    if not session or not session.pdf_report_path: raise SessionExpiredError("No report.")
-    return FileResponse(session.pdf_report_path, filename=f"Report_{session_id}.pdf")
\ No newline at end of file
+def download_report(session_id: str, request: Request, db: Session = Depends(get_db)):
+    session = db.get(models.QuizSession, session_id)
+    if not session or not session.completed_at: raise SessionExpiredError("No report.")
+    etag = report_service.etag(db, session)
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match.strip() == "*" or f'"{etag}"' in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    previous_path = session.pdf_report_path
+    pdf = report_service.get_pdf(db, session, etag)
+    if session.pdf_report_path != previous_path: db.commit()
+    headers["Content-Disposition"] = f'attachment; filename="Report_{session_id}.pdf"'
+    return Response(content=pdf, media_type="application/pdf", headers=headers)
\ No newline at end of file
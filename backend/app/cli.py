@@ -0,0 +1,48 @@
+"""Command-line tools for the quiz backend.
+
+From backend/:
+
+    python -m app.cli export --format csv --from 2026-01-05 --to 2026-04-30 --out term.csv
+    python -m app.cli export --format ndjson --file-hash <sha256> > sessions.ndjson
+"""
+import argparse
+import sys
+from datetime import datetime
+from pathlib import Path
+
+def export(args) -> int:
+    from app.core.exceptions import ConfigurationError
+    from app.db.session import init_db
+    from app.services.export import ExportFilters, export_service
+    init_db()
+    try:
+        _, chunks = export_service.open(args.format, args.rows, ExportFilters(args.date_from, args.date_to, args.file_hash, args.status))
+    except ConfigurationError as e:
+        print(e.detail, file=sys.stderr)
+        return 2
+    out = open(args.out, "wb") if args.out else sys.stdout.buffer
+    try:
+        for chunk in chunks: out.write(chunk)
+    finally:
+        if args.out: out.close()
+    return 0
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Stream sessions with questions, responses and proctor logs")
+    export_parser.add_argument("--format", default="ndjson", choices=["ndjson", "csv", "parquet"])
+    export_parser.add_argument("--rows", default="questions", choices=["questions", "proctor_logs"], help="Row layout for csv/parquet")
+    export_parser.add_argument("--from", dest="date_from", type=datetime.fromisoformat, help="Sessions created at or after (ISO date/time)")
+    export_parser.add_argument("--to", dest="date_to", type=datetime.fromisoformat, help="Sessions created before (ISO date/time)")
+    export_parser.add_argument("--file-hash")
+    export_parser.add_argument("--status")
+    export_parser.add_argument("--out", type=Path, help="Output file (default: stdout)")
+    export_parser.set_defaults(handler=export)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
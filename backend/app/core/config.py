@@ -15,11 +15,98 @@ class Settings:
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./data/quiz.db")
     UPLOAD_DIR: Path = Path(os.getenv("UPLOAD_DIR", "./data/uploads"))
     INDEX_DIR: Path = Path(os.getenv("INDEX_DIR", "./data/indices"))
+    LOCK_DIR: Path = Path(os.getenv("LOCK_DIR", "./data/locks"))
+
+    # Database engine profile (SQLite pragmas; pool sizing applies to server databases)
+    SQLITE_WAL: bool = os.getenv("SQLITE_WAL", "true").lower() == "true"
+    SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    DB_BUSY_TIMEOUT_MS: int = int(os.getenv("DB_BUSY_TIMEOUT_MS", "15000"))
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+    # Uploads
+    MAX_UPLOAD_MB: int = int(os.getenv("MAX_UPLOAD_MB", "50"))
+    UPLOAD_CHUNK_SIZE: int = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+    INGESTION_WORKERS: int = int(os.getenv("INGESTION_WORKERS", "2"))
+    # Seconds an ingestion job's status stays readable (from any worker) after its last update
+    JOB_STATE_TTL: float = float(os.getenv("JOB_STATE_TTL", "86400"))
+    INGESTION_PARSE_WORKERS: int = int(os.getenv("INGESTION_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+    PARSE_PAGES_PER_TASK: int = int(os.getenv("PARSE_PAGES_PER_TASK", "8"))
+    PARSE_DOCX_PARAGRAPHS: int = int(os.getenv("PARSE_DOCX_PARAGRAPHS", "40"))
+    PARSE_TEXT_BLOCK_BYTES: int = int(os.getenv("PARSE_TEXT_BLOCK_BYTES", str(64 * 1024)))
+    EMBED_BATCH_SIZE: int = int(os.getenv("EMBED_BATCH_SIZE", "32"))
     
     # AI Config (Offline)
     MODEL_PATH: str = os.getenv("MODEL_PATH", "./models/mistral-7b-instruct-v0.2.Q4_K_M.gguf")
     EMBEDDING_MODEL_NAME: str = os.getenv("EMBEDDING_MODEL_NAME", "BAAI/bge-small-en-v1.5")
-    
+    # "huggingface", or "hash" for the deterministic offline stand-in used by benchmarks
+    EMBEDDING_BACKEND: str = os.getenv("EMBEDDING_BACKEND", "huggingface")
+
+    # Index cache (size budget is measured on the persisted index files)
+    INDEX_CACHE_MAX_ENTRIES: int = int(os.getenv("INDEX_CACHE_MAX_ENTRIES", "16"))
+    INDEX_CACHE_MAX_MB: int = int(os.getenv("INDEX_CACHE_MAX_MB", "512"))
+    VECTOR_STORE_DTYPE: str = os.getenv("VECTOR_STORE_DTYPE", "float32")
+    EMBEDDING_CACHE_ENABLED: bool = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+    # LLM backend ("ollama", or "fake" for the deterministic offline stand-in)
+    LLM_BACKEND: str = os.getenv("LLM_BACKEND", "ollama")
+    OLLAMA_BASE_URL: str = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+    LLM_MODEL: str = os.getenv("LLM_MODEL", "llama3.2:1b")
+    LLM_TIMEOUT: float = float(os.getenv("LLM_TIMEOUT", "60"))
+    LLM_RETRIES: int = int(os.getenv("LLM_RETRIES", "1"))
+    LLM_STRUCTURED_OUTPUT: str = os.getenv("LLM_STRUCTURED_OUTPUT", "schema")  # schema | json | off
+    LLM_MAX_CONNECTIONS: int = int(os.getenv("LLM_MAX_CONNECTIONS", "8"))
+    LLM_HEALTH_TTL: float = float(os.getenv("LLM_HEALTH_TTL", "15"))
+    LLM_HEALTH_TIMEOUT: float = float(os.getenv("LLM_HEALTH_TIMEOUT", "5"))
+    LLM_BREAKER_THRESHOLD: int = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+    LLM_BREAKER_COOLDOWN: float = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+    # In-flight generate calls allowed across all worker processes (0 = no limit; gunicorn.conf.py sets it)
+    LLM_GLOBAL_CONCURRENCY: int = int(os.getenv("LLM_GLOBAL_CONCURRENCY", "0"))
+
+    # Generation
+    GENERATION_CONCURRENCY: int = int(os.getenv("GENERATION_CONCURRENCY", "4"))
+    GENERATION_MAX_ATTEMPTS: int = int(os.getenv("GENERATION_MAX_ATTEMPTS", "20"))
+    # Global attempt budget per request (0 = GENERATION_MAX_ATTEMPTS per requested difficulty) and /generate's deadline (0 = none)
+    GENERATION_ATTEMPT_BUDGET: int = int(os.getenv("GENERATION_ATTEMPT_BUDGET", "0"))
+    GENERATION_DEADLINE_SECONDS: float = float(os.getenv("GENERATION_DEADLINE_SECONDS", "55"))
+    GENERATION_BATCH_SIZE: int = int(os.getenv("GENERATION_BATCH_SIZE", "3"))
+    CONTEXT_WINDOW_CHUNKS: int = int(os.getenv("CONTEXT_WINDOW_CHUNKS", "3"))
+    DEDUP_SIMILARITY_THRESHOLD: float = float(os.getenv("DEDUP_SIMILARITY_THRESHOLD", "0.92"))
+    DEDUP_DOCUMENT_HISTORY: bool = os.getenv("DEDUP_DOCUMENT_HISTORY", "true").lower() == "true"
+
+    # Question bank (pre-generated per document and difficulty)
+    BANK_ENABLED: bool = os.getenv("BANK_ENABLED", "true").lower() == "true"
+    BANK_TARGET_PER_DIFFICULTY: int = int(os.getenv("BANK_TARGET_PER_DIFFICULTY", "20"))
+    BANK_LOW_WATERMARK: int = int(os.getenv("BANK_LOW_WATERMARK", "10"))
+    BANK_MAX_SERVES: int = int(os.getenv("BANK_MAX_SERVES", "5"))
+    # Retired questions kept per document (newest first) to steer refills away from repeats; older ones are deleted
+    BANK_RETIRED_KEEP: int = int(os.getenv("BANK_RETIRED_KEEP", "100"))
+    BANK_WORKERS: int = int(os.getenv("BANK_WORKERS", "1"))
+    # LLM calls a refill keeps in flight, on its own pool so it never queues ahead of a live /generate
+    BANK_GENERATION_CONCURRENCY: int = int(os.getenv("BANK_GENERATION_CONCURRENCY", "1"))
+
+    # Proctoring
+    PROCTOR_MAX_VIOLATIONS: int = int(os.getenv("PROCTOR_MAX_VIOLATIONS", "3"))
+    PROCTOR_MAX_BATCH: int = int(os.getenv("PROCTOR_MAX_BATCH", "50"))
+
+    # Reports
+    REPORT_WORKERS: int = int(os.getenv("REPORT_WORKERS", "1"))
+    REPORT_CACHE_MAX_MB: int = int(os.getenv("REPORT_CACHE_MAX_MB", "32"))
+
+    # Export: sessions read (with their questions, responses and proctor logs) per database round trip
+    EXPORT_BATCH_SIZE: int = int(os.getenv("EXPORT_BATCH_SIZE", "200"))
+
+    # Startup: warm the embedding model (and probe the LLM) in the background before reporting ready
+    WARMUP_ON_STARTUP: bool = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
+
+    # Multi-worker serving: the gunicorn master loads the embedding model before forking so workers share its pages
+    PRELOAD_EMBEDDINGS: bool = os.getenv("PRELOAD_EMBEDDINGS", "true").lower() == "true"
+    INDEX_LOCK_TIMEOUT: float = float(os.getenv("INDEX_LOCK_TIMEOUT", "600"))
+    REPORT_LOCK_TIMEOUT: float = float(os.getenv("REPORT_LOCK_TIMEOUT", "60"))
+
     # CORS
     FRONTEND_URL: str = os.getenv("FRONTEND_URL", "http://localhost:5173")
 
@@ -27,8 +114,8 @@ class Settings:
         """Ensure critical directories exist on startup."""
         self.UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
         self.INDEX_DIR.mkdir(parents=True, exist_ok=True)
+        self.LOCK_DIR.mkdir(parents=True, exist_ok=True)
         # Create models dir if not exists (parent of model path)
         Path(self.MODEL_PATH).parent.mkdir(parents=True, exist_ok=True)
 
-settings = Settings()
-settings.create_dirs()
\ No newline at end of file
+settings = Settings()
\ No newline at end of file
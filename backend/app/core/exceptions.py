@@ -4,6 +4,10 @@ class InvalidFileFormat(HTTPException):
     def __init__(self, detail: str = "Invalid file format. Only PDF, PPT, DOCX, TXT allowed."):
         super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
 
+class FileTooLarge(HTTPException):
+    def __init__(self, detail: str = "File exceeds the maximum upload size."):
+        super().__init__(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detail)
+
 class EmptyContentError(HTTPException):
     def __init__(self, detail: str = "File contains no extractable text."):
         super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
@@ -0,0 +1,107 @@
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+# Advisory locks the OS drops when the holding process dies, so a crashed worker never leaves a stale lock behind
+if os.name == "nt":
+    import msvcrt
+
+    def _try_lock(fd: int) -> bool:
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def _unlock(fd: int):
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _try_lock(fd: int) -> bool:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    def _unlock(fd: int):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+class FileLock:
+    """Exclusive lock on a file, shared by every process (and thread) that opens the same path.
+
+    Lock files are left in place after release: deleting one while another process waits on it would let two
+    holders in at once.
+    """
+
+    def __init__(self, path: Path, timeout: Optional[float] = None, poll: float = 0.05):
+        self.path = path
+        self.timeout = timeout
+        self.poll = poll
+        self._fd: Optional[int] = None
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+    def acquire(self, timeout: Optional[float] = None, blocking: bool = True) -> bool:
+        timeout = self.timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        delay = self.poll
+        while not _try_lock(fd):
+            if not blocking or (deadline is not None and time.monotonic() >= deadline):
+                os.close(fd)
+                return False
+            # Back off up to half a second; holders are index builds and LLM calls, not microsecond sections
+            time.sleep(delay if deadline is None else min(delay, max(deadline - time.monotonic(), 0)))
+            delay = min(delay * 2, 0.5)
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is None: return
+        fd, self._fd = self._fd, None
+        try:
+            _unlock(fd)
+        finally:
+            os.close(fd)
+
+    def __enter__(self) -> "FileLock":
+        if not self.acquire(): raise TimeoutError(f"Timed out waiting for lock {self.path.name}")
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+class FileSemaphore:
+    """Counting semaphore across processes: ``slots`` lock files, a holder owns any one of them."""
+
+    def __init__(self, directory: Path, slots: int, poll: float = 0.05):
+        self.directory = directory
+        self.slots = max(1, slots)
+        self.poll = poll
+
+    def acquire(self, timeout: Optional[float] = None) -> Optional[FileLock]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        locks: List[FileLock] = [FileLock(self.directory / f"slot-{i}.lock") for i in range(self.slots)]
+        # Start at a per-process offset so workers do not all probe slot 0 first
+        offset = os.getpid() % self.slots
+        delay = self.poll
+        while True:
+            for i in range(self.slots):
+                lock = locks[(offset + i) % self.slots]
+                if lock.acquire(blocking=False): return lock
+            if deadline is not None and time.monotonic() >= deadline: return None
+            time.sleep(delay if deadline is None else min(delay, max(deadline - time.monotonic(), 0)))
+            delay = min(delay * 2, 0.5)
+
+    @contextmanager
+    def hold(self, timeout: Optional[float] = None) -> Iterator[FileLock]:
+        lock = self.acquire(timeout)
+        if lock is None: raise TimeoutError(f"All {self.slots} slots in {self.directory.name} are busy")
+        try:
+            yield lock
+        finally:
+            lock.release()
@@ -0,0 +1,154 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Route template of the request being served; background threads report as "background"
+current_endpoint: ContextVar[str] = ContextVar("current_endpoint", default="background")
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _quote(value) -> str:
+    return '"' + _escape(value) + '"'
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}={_quote(value)}' for name, value in zip(names, values)]
+    if extra: pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], list] = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound: series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        lines = self.header()
+        for key, series in items:
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, 'le=' + _quote(bound))} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, 'le=' + _quote('+Inf'))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+class CallbackGauge(_Metric):
+    """Gauge whose labelled values are read from a callback at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str], callback: Callable[[], Dict[Tuple[str, ...], float]]):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        try:
+            values = self.callback()
+        except Exception:
+            return []
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in values.items()]
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge_callback(self, name: str, documentation: str, labelnames: Iterable[str], callback) -> CallbackGauge:
+        return self._register(CallbackGauge(name, documentation, labelnames, callback))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+registry = MetricsRegistry()
+
+# Generation pipeline
+GENERATION_ATTEMPTS = registry.counter("quiz_generation_attempts_total", "LLM calls made for question generation.", ["difficulty"])
+GENERATION_ACCEPTED = registry.counter("quiz_generation_accepted_total", "Questions accepted; attempts_total / accepted_total is attempts per accepted question.", ["difficulty"])
+GENERATION_REJECTIONS = registry.counter("quiz_generation_rejections_total", "Generated items rejected, by guardrail reason.", ["difficulty", "reason"])
+GENERATION_PARSE_FAILURES = registry.counter("quiz_generation_parse_failures_total", "LLM replies that yielded no parseable question object.", ["difficulty"])
+GENERATION_RUNS = registry.counter("quiz_generation_runs_total", "Generation requests by outcome and, for partial ones, why they stopped.", ["status", "reason"])
+INDEX_LOAD_SECONDS = registry.histogram("quiz_index_load_seconds", "Time to get a document index for retrieval: cache hit, mmap open or legacy migration.")
+LLM_SECONDS = registry.histogram("quiz_llm_request_seconds", "LLM call latency, including retries.", ["backend", "outcome"])
+
+# Ingestion
+INGESTION_BYTES = registry.counter("quiz_ingestion_bytes_total", "Bytes of uploaded documents accepted.")
+INGESTION_CHUNKS = registry.counter("quiz_ingestion_chunks_total", "Chunks written to new indices.")
+INGESTION_SECONDS = registry.histogram("quiz_ingestion_seconds", "Time to build one document index.")
+EMBEDDING_CACHE_LOOKUPS = registry.counter("quiz_embedding_cache_lookups_total", "Chunk embedding cache lookups during ingestion.", ["result"])
+
+# Requests, database and reports
+HTTP_SECONDS = registry.histogram("quiz_http_request_seconds", "HTTP request latency.", ["method", "endpoint", "status"])
+DB_SECONDS = registry.histogram("quiz_db_query_seconds", "Database statement time, by endpoint.", ["endpoint"],
+                                buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0))
+REPORT_SECONDS = registry.histogram("quiz_report_render_seconds", "PDF report render time.")
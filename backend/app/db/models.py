@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float, JSON, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float, JSON, Text, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from app.db.session import Base
 
@@ -9,10 +9,14 @@ class UploadedFile(Base):
     file_hash = Column(String, primary_key=True, index=True)
     filename = Column(String, nullable=False)
     index_path = Column(String, nullable=False)
+    title = Column(String, nullable=True)
+    sample_text = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
 class QuizSession(Base):
     __tablename__ = "quiz_sessions"
+    # Serves the history listing: status filter plus (created_at, id) keyset order
+    __table_args__ = (Index("ix_quiz_sessions_status_created_at", "status", "created_at", "id"),)
 
     id = Column(String, primary_key=True, index=True)
     file_hash = Column(String, ForeignKey("uploaded_files.file_hash"))
@@ -23,6 +27,7 @@ class QuizSession(Base):
     accuracy = Column(Float, default=0.0)
     difficulty_stats = Column(JSON, nullable=True)
     status = Column(String, default="ACTIVE")
+    violation_count = Column(Integer, default=0, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     completed_at = Column(DateTime, nullable=True)
     pdf_report_path = Column(String, nullable=True)
@@ -67,4 +72,29 @@ class ProctorLog(Base):
     violation_type = Column(String, nullable=False)
     timestamp = Column(DateTime, default=datetime.utcnow)
 
-    session = relationship("QuizSession", back_populates="proctor_logs")
\ No newline at end of file
+    session = relationship("QuizSession", back_populates="proctor_logs")
+
+class BankQuestion(Base):
+    __tablename__ = "bank_questions"
+    __table_args__ = (Index("ix_bank_questions_file_hash_difficulty", "file_hash", "difficulty"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    file_hash = Column(String, ForeignKey("uploaded_files.file_hash"), nullable=False)
+    difficulty = Column(String, nullable=False)
+    question_text = Column(Text, nullable=False)
+    options = Column(JSON, nullable=False)
+    correct_answer = Column(String, nullable=False)
+    explanation = Column(Text, nullable=False)
+    reference_context = Column(Text, nullable=True)
+    embedding = Column(LargeBinary, nullable=True)
+    served_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ChunkEmbedding(Base):
+    __tablename__ = "chunk_embeddings"
+
+    # sha256 of model name + chunk text, so identical chunks share one row across documents
+    key = Column(String, primary_key=True)
+    model = Column(String, nullable=False)
+    embedding = Column(LargeBinary, nullable=False)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
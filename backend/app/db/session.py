@@ -1,11 +1,39 @@
-from sqlalchemy import create_engine
+import time
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import settings
+from app.core.locks import FileLock
+from app.core.metrics import DB_SECONDS, current_endpoint
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False}
-)
+IS_SQLITE = settings.DATABASE_URL.startswith("sqlite")
+
+def _engine_options() -> dict:
+    if IS_SQLITE:
+        return {"connect_args": {"check_same_thread": False, "timeout": settings.DB_BUSY_TIMEOUT_MS / 1000}}
+    return {
+        "pool_size": settings.DB_POOL_SIZE, "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT, "pool_recycle": settings.DB_POOL_RECYCLE, "pool_pre_ping": True
+    }
+
+engine = create_engine(settings.DATABASE_URL, **_engine_options())
+
+if IS_SQLITE:
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_conn, connection_record):
+        # WAL lets readers run alongside the single writer; NORMAL only fsyncs at checkpoints
+        cursor = dbapi_conn.cursor()
+        if settings.SQLITE_WAL: cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={settings.DB_BUSY_TIMEOUT_MS}")
+        cursor.close()
+
+@event.listens_for(engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+@event.listens_for(engine, "after_cursor_execute")
+def _record_query_time(conn, cursor, statement, parameters, context, executemany):
+    DB_SECONDS.observe(time.perf_counter() - conn.info["query_started"].pop(), endpoint=current_endpoint.get())
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -16,4 +44,28 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def init_db():
+    from app.db import models  # noqa: F401 (registers the tables)
+    # Worker processes start together; one at a time inspects and creates the schema, the rest find it in place
+    with FileLock(settings.LOCK_DIR / "schema.lock"):
+        Base.metadata.create_all(bind=engine)
+        upgrade_schema()
+
+def upgrade_schema():
+    """Add columns and indexes introduced after a table was first created; create_all only creates missing tables."""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name): continue
+            existing = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing: continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=engine.dialect)}"
+                if column.default is not None and column.default.is_scalar:
+                    ddl += f" DEFAULT {column.default.arg!r}"
+                conn.execute(text(ddl))
+            existing_indexes = {idx["name"] for idx in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes: index.create(conn)
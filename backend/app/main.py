@@ -5,18 +5,45 @@ from pathlib import Path
 # Add the current directory to sys.path to handle module imports
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
-from fastapi import FastAPI
+import threading
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlalchemy import text
 from app.api.endpoints import router as api_router
 from app.core.config import settings
-from app.db.session import engine, Base
+from app.core.metrics import registry, HTTP_SECONDS
+from app.db.session import engine, init_db
+from app.services.ingestion import ingestion_service
+from app.services.llm import get_llm
 
-# This ensures the new schema (test_name, difficulty_stats) is created
-Base.metadata.create_all(bind=engine)
+warmup = {"done": not settings.WARMUP_ON_STARTUP, "error": None}
+
+def _warm_up():
+    # Load the embedding model off the event loop; /health/ready stays 503 until it is hot
+    try:
+        ingestion_service.embed_model.get_text_embedding("warm-up")
+        get_llm().healthy(force=True)
+    except Exception as e:
+        warmup["error"] = str(e)
+    finally:
+        warmup["done"] = True
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Directories and schema are created at startup, not as import side effects
+    settings.create_dirs()
+    init_db()
+    if settings.WARMUP_ON_STARTUP:
+        threading.Thread(target=_warm_up, name="warmup", daemon=True).start()
+    yield
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -29,6 +56,62 @@ app.add_middleware(
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    # FastAPI spools the whole multipart body before the handler runs, so an honest oversized
+    # Content-Length is refused here; save_stream still enforces the limit on chunked uploads
+    if request.method == "POST" and request.url.path == f"{settings.API_V1_STR}/upload":
+        length = request.headers.get("content-length", "")
+        # 64 KB of slack covers the multipart boundaries and part headers around the file
+        if length.isdigit() and int(length) > settings.MAX_UPLOAD_MB * 1024 * 1024 + 64 * 1024:
+            return JSONResponse({"detail": f"File exceeds the {settings.MAX_UPLOAD_MB} MB upload limit."}, status_code=413)
+    return await call_next(request)
+
+@app.middleware("http")
+async def track_requests(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template, not raw path, so session ids don't explode metric cardinality
+        route = request.scope.get("route")
+        endpoint = getattr(route, "path", "unmatched")
+        HTTP_SECONDS.observe(time.perf_counter() - started, method=request.method, endpoint=endpoint, status=status)
+
+registry.gauge_callback(
+    "quiz_index_cache", "Loaded-index LRU cache counters and size.", ["stat"],
+    lambda: {(name,): value for name, value in ingestion_service.index_cache.stats().items()}
+)
+registry.gauge_callback(
+    "quiz_llm_circuit_open", "1 while the LLM circuit breaker is rejecting calls.", ["backend"],
+    lambda: {(get_llm().name,): float(getattr(getattr(get_llm(), "breaker", None), "state", "closed") == "open")}
+)
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/health/live", include_in_schema=False)
+async def health_live():
+    return {"status": "alive"}
+
+@app.get("/health/ready", include_in_schema=False)
+def health_ready():
+    checks = {"warmup": warmup["done"] and not warmup["error"], "embeddings": ingestion_service.embed_model_loaded, "llm": get_llm().healthy()}
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        checks["database"] = True
+    except Exception:
+        checks["database"] = False
+    # The LLM is reported but not required: uploads, history and reports work without it
+    ready = checks["warmup"] and checks["database"]
+    body = {"status": "ready" if ready else "starting", "checks": checks, "error": warmup["error"]}
+    return JSONResponse(body, status_code=200 if ready else 503)
+
 @app.get("/")
 async def root():
     return {
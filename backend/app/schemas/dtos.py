@@ -7,6 +7,16 @@ class FileUploadResponse(BaseModel):
     file_hash: str
     filename: str
     message: str
+    status: str = "COMPLETED"
+    job_id: Optional[str] = None
+
+class IngestionJobStatus(BaseModel):
+    job_id: str
+    file_hash: str
+    status: str
+    stage: str
+    progress: float
+    error: Optional[str] = None
 
 # Quiz Configuration
 class DifficultyCount(BaseModel):
@@ -36,6 +46,10 @@ class SessionResponse(BaseModel):
     session_id: str
     test_name: str
     questions: List[QuestionBase]
+    # PARTIAL when the deadline or attempt budget ran out first; shortfall says what is missing
+    status: str = "COMPLETE"
+    reason: Optional[str] = None
+    shortfall: Optional[DifficultyCount] = None
 
 # Submission & Evaluation
 class AnswerSubmission(BaseModel):
@@ -50,6 +64,15 @@ class ProctorIncident(BaseModel):
     session_id: str
     violation_type: str
 
+class ProctorIncidentBatch(BaseModel):
+    session_id: str
+    violation_types: List[str]
+
+class ProctorLogResponse(BaseModel):
+    status: str
+    violation_count: int
+    session_status: str
+
 class ResultResponse(BaseModel):
     session_id: str
     test_name: str
@@ -71,4 +94,5 @@ class HistoryItem(BaseModel):
     status: str
 
 class HistoryResponse(BaseModel):
-    attempts: List[HistoryItem]
\ No newline at end of file
+    attempts: List[HistoryItem]
+    next_cursor: Optional[str] = None
\ No newline at end of file
@@ -0,0 +1,50 @@
+from typing import List, Sequence, Tuple
+import numpy as np
+
+class QuestionDedupIndex:
+    """Near-duplicate check for questions: unit-normalised embeddings in a preallocated matrix, scored in one matmul."""
+
+    def __init__(self, embed_model, threshold: float, capacity: int = 64):
+        self._embed_model = embed_model
+        self.threshold = threshold
+        self._capacity = capacity
+        self._matrix = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.asarray(self._embed_model.get_text_embedding_batch(list(texts)), dtype=np.float32)
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    def add(self, vectors: np.ndarray):
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if not len(vectors): return
+        if self._matrix is None:
+            self._matrix = np.empty((max(self._capacity, len(vectors)), vectors.shape[1]), dtype=np.float32)
+        elif self._size + len(vectors) > len(self._matrix):
+            grown = np.empty((max(2 * len(self._matrix), self._size + len(vectors)), self._matrix.shape[1]), dtype=np.float32)
+            grown[:self._size] = self._matrix[:self._size]
+            self._matrix = grown
+        self._matrix[self._size:self._size + len(vectors)] = vectors
+        self._size += len(vectors)
+
+    def add_texts(self, texts: Sequence[str]):
+        if texts: self.add(self.embed(texts))
+
+    def check(self, texts: Sequence[str]) -> Tuple[List[bool], np.ndarray]:
+        """Flag which candidates are new, against the history and against earlier candidates in the same batch."""
+        if not texts: return [], np.empty((0, 0), dtype=np.float32)
+        vectors = self.embed(texts)
+        if self._size:
+            keep = (vectors @ self._matrix[:self._size].T).max(axis=1) < self.threshold
+        else:
+            keep = np.ones(len(vectors), dtype=bool)
+        if len(vectors) > 1:
+            pairwise = vectors @ vectors.T
+            for i in range(1, len(vectors)):
+                earlier = np.flatnonzero(keep[:i])
+                if keep[i] and len(earlier) and pairwise[i, earlier].max() >= self.threshold:
+                    keep[i] = False
+        return keep.tolist(), vectors
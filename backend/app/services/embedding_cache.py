@@ -0,0 +1,85 @@
+import hashlib
+import threading
+from datetime import datetime
+from typing import Dict, List, Sequence, Set
+import numpy as np
+from sqlalchemy.exc import IntegrityError
+from app.core.config import settings
+from app.core.metrics import EMBEDDING_CACHE_LOOKUPS
+from app.db import models
+from app.db.session import SessionLocal
+
+class EmbeddingCache:
+    """Content-addressed chunk embeddings: re-ingesting a revised document only embeds the chunks that changed."""
+
+    def __init__(self):
+        # Hit keys wait here for prune(): one last_used_at write per document instead of one per embedding batch
+        self._touched: Set[str] = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model_name: str, text: str) -> str:
+        return hashlib.sha256(f"{model_name}\0{text}".encode()).hexdigest()
+
+    def embed(self, embed_model, model_name: str, texts: Sequence[str]) -> List[List[float]]:
+        if not settings.EMBEDDING_CACHE_ENABLED: return embed_model.get_text_embedding_batch(list(texts))
+        keys = [self.key(model_name, text) for text in texts]
+        db = SessionLocal()
+        try:
+            found = self._lookup(db, keys)
+            hits = sum(1 for k in keys if k in found)
+            EMBEDDING_CACHE_LOOKUPS.inc(hits, result="hit")
+            EMBEDDING_CACHE_LOOKUPS.inc(len(keys) - hits, result="miss")
+
+            # Repeated chunks within the batch (shared boilerplate) are embedded once
+            missing = {k: text for k, text in zip(keys, texts) if k not in found}
+            if missing:
+                vectors = embed_model.get_text_embedding_batch(list(missing.values()))
+                computed = {k: np.asarray(v, dtype=np.float32) for k, v in zip(missing, vectors)}
+                self._store(db, model_name, computed)
+                found.update(computed)
+            return [found[k].tolist() for k in keys]
+        finally:
+            db.close()
+
+    def _lookup(self, db, keys: List[str]) -> Dict[str, np.ndarray]:
+        unique = list(set(keys))
+        rows = db.query(models.ChunkEmbedding.key, models.ChunkEmbedding.embedding).filter(models.ChunkEmbedding.key.in_(unique)).all()
+        with self._lock:
+            self._touched.update(r.key for r in rows)
+        return {r.key: np.frombuffer(r.embedding, dtype=np.float32) for r in rows}
+
+    def _store(self, db, model_name: str, vectors: Dict[str, np.ndarray]):
+        rows = [{"key": k, "model": model_name, "embedding": v.tobytes()} for k, v in vectors.items()]
+        try:
+            db.bulk_insert_mappings(models.ChunkEmbedding, rows)
+            db.commit()
+        except IntegrityError:
+            # A concurrent ingestion stored some of the same chunks first; keep only the ones still missing
+            db.rollback()
+            present = {k for (k,) in db.query(models.ChunkEmbedding.key).filter(models.ChunkEmbedding.key.in_(list(vectors)))}
+            db.bulk_insert_mappings(models.ChunkEmbedding, [r for r in rows if r["key"] not in present])
+            db.commit()
+
+    def prune(self):
+        """Record the hits since the last call, then drop least-recently-used entries beyond EMBEDDING_CACHE_MAX_ENTRIES."""
+        with self._lock:
+            touched, self._touched = list(self._touched), set()
+        db = SessionLocal()
+        try:
+            if touched:
+                now = datetime.utcnow()
+                for start in range(0, len(touched), 500):
+                    db.query(models.ChunkEmbedding).filter(models.ChunkEmbedding.key.in_(touched[start:start + 500])).update(
+                        {models.ChunkEmbedding.last_used_at: now}, synchronize_session=False
+                    )
+                db.commit()
+            excess = db.query(models.ChunkEmbedding).count() - settings.EMBEDDING_CACHE_MAX_ENTRIES
+            if excess <= 0: return
+            oldest = db.query(models.ChunkEmbedding.key).order_by(models.ChunkEmbedding.last_used_at).limit(excess).subquery()
+            db.query(models.ChunkEmbedding).filter(models.ChunkEmbedding.key.in_(oldest.select())).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+embedding_cache = EmbeddingCache()
@@ -0,0 +1,44 @@
+import hashlib
+import math
+import re
+from typing import List
+from llama_index.core.embeddings import BaseEmbedding
+from app.core.config import settings
+
+class HashingEmbedding(BaseEmbedding):
+    """Deterministic offline stand-in for the HuggingFace model: signed feature hashing of word unigrams."""
+
+    dim: int = 384
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "HashingEmbedding"
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dim
+        for token in re.findall(r"[a-z0-9]+", text.lower()):
+            digest = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+            vector[digest % self.dim] += 1.0 if digest >> 63 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._embed(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._embed(text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._embed(query)
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return self._embed(text)
+
+def build_embed_model() -> BaseEmbedding:
+    if settings.EMBEDDING_BACKEND == "hash":
+        return HashingEmbedding(embed_batch_size=settings.EMBED_BATCH_SIZE)
+    from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+    return HuggingFaceEmbedding(model_name=settings.EMBEDDING_MODEL_NAME, embed_batch_size=settings.EMBED_BATCH_SIZE)
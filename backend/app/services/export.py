@@ -0,0 +1,209 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session, selectinload
+from app.core.config import settings
+from app.core.exceptions import ConfigurationError
+from app.db import models
+from app.db.session import SessionLocal
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Flat layouts for CSV/Parquet; NDJSON carries each session as one nested document instead
+SESSION_COLUMNS = [
+    ("session_id", "str"), ("file_hash", "str"), ("test_name", "str"), ("status", "str"),
+    ("created_at", "time"), ("completed_at", "time"), ("total_score", "float"), ("max_score", "float"),
+    ("accuracy", "float"), ("violation_count", "int"),
+]
+EXPORT_ROWS = {
+    "questions": SESSION_COLUMNS + [
+        ("question_id", "int"), ("difficulty", "str"), ("question_text", "str"),
+        ("option_a", "str"), ("option_b", "str"), ("option_c", "str"), ("option_d", "str"),
+        ("correct_answer", "str"), ("selected_answer", "str"), ("is_correct", "bool"), ("answered_at", "time"),
+        ("explanation", "str"), ("reference_context", "str"),
+    ],
+    "proctor_logs": SESSION_COLUMNS + [("log_id", "int"), ("violation_type", "str"), ("timestamp", "time")],
+}
+
+class ExportFilters(NamedTuple):
+    date_from: Optional[datetime] = None  # inclusive, on session created_at
+    date_to: Optional[datetime] = None    # exclusive
+    file_hash: Optional[str] = None
+    status: Optional[str] = None
+
+class _ChunkSink:
+    """Write-only file object for pyarrow whose bytes are handed out as soon as they are written."""
+
+    closed = False
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+class ExportService:
+    """Streams sessions with their questions, responses and proctor logs, reading the database in keyset batches."""
+
+    def __init__(self, batch_size: int):
+        self.batch_size = max(1, batch_size)
+
+    def open(self, fmt: str, rows: str, filters: ExportFilters) -> Tuple[str, Iterator[bytes]]:
+        """Validate up front (so errors are proper HTTP responses), then return (media type, lazy byte stream)."""
+        if fmt not in EXPORT_FORMATS: raise ConfigurationError(f"Unknown export format '{fmt}'. Use one of: {', '.join(EXPORT_FORMATS)}.")
+        if rows not in EXPORT_ROWS: raise ConfigurationError(f"Unknown export rows '{rows}'. Use one of: {', '.join(EXPORT_ROWS)}.")
+        if fmt == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise ConfigurationError("Parquet export requires pyarrow (pip install pyarrow).")
+        return EXPORT_FORMATS[fmt], self._stream(fmt, rows, filters)
+
+    def _stream(self, fmt: str, rows: str, filters: ExportFilters) -> Iterator[bytes]:
+        # The stream outlives the request handler, so it owns its database session
+        db = SessionLocal()
+        try:
+            batches = self.iter_batches(db, filters)
+            if fmt == "ndjson":
+                yield from self._write_ndjson(batches)
+            else:
+                row_fn = self.question_rows if rows == "questions" else self.proctor_rows
+                write = self._write_csv if fmt == "csv" else self._write_parquet
+                yield from write(batches, EXPORT_ROWS[rows], row_fn)
+        finally:
+            db.close()
+
+    def iter_batches(self, db: Session, filters: ExportFilters) -> Iterator[List[models.QuizSession]]:
+        # Keyset on (created_at, id): each batch is one indexed range scan plus three IN-list loads for the children
+        QS = models.QuizSession
+        query = db.query(QS).options(
+            selectinload(QS.questions), selectinload(QS.responses), selectinload(QS.proctor_logs)
+        )
+        if filters.date_from: query = query.filter(QS.created_at >= filters.date_from)
+        if filters.date_to: query = query.filter(QS.created_at < filters.date_to)
+        if filters.file_hash: query = query.filter(QS.file_hash == filters.file_hash)
+        if filters.status: query = query.filter(QS.status == filters.status)
+        last = None
+        while True:
+            page = query
+            if last: page = page.filter(or_(QS.created_at > last[0], and_(QS.created_at == last[0], QS.id > last[1])))
+            batch = page.order_by(QS.created_at, QS.id).limit(self.batch_size).all()
+            if not batch: return
+            yield batch
+            last = (batch[-1].created_at, batch[-1].id)
+            # Drop the batch from the identity map so memory stays flat however many sessions are exported
+            db.expunge_all()
+            if len(batch) < self.batch_size: return
+
+    def session_fields(self, s: models.QuizSession) -> Dict:
+        return {
+            "session_id": s.id, "file_hash": s.file_hash, "test_name": s.test_name, "status": s.status,
+            "created_at": s.created_at, "completed_at": s.completed_at, "total_score": s.total_score,
+            "max_score": s.max_score, "accuracy": s.accuracy, "violation_count": s.violation_count or 0,
+        }
+
+    def session_record(self, s: models.QuizSession) -> Dict:
+        responses = {r.question_id: r for r in s.responses}
+        record = self.session_fields(s)
+        record.update(created_at=_iso(s.created_at), completed_at=_iso(s.completed_at), config=s.config, difficulty_stats=s.difficulty_stats)
+        record["questions"] = []
+        for q in sorted(s.questions, key=lambda q: q.id):
+            r = responses.get(q.id)
+            record["questions"].append({
+                "question_id": q.id, "difficulty": q.difficulty, "question_text": q.question_text, "options": q.options,
+                "correct_answer": q.correct_answer, "explanation": q.explanation, "reference_context": q.reference_context,
+                "response": {"selected_answer": r.selected_answer, "is_correct": r.is_correct, "timestamp": _iso(r.timestamp)} if r else None,
+            })
+        record["proctor_logs"] = [
+            {"log_id": log.id, "violation_type": log.violation_type, "timestamp": _iso(log.timestamp)}
+            for log in sorted(s.proctor_logs, key=lambda log: log.id)
+        ]
+        return record
+
+    def question_rows(self, s: models.QuizSession) -> Iterator[Dict]:
+        session = self.session_fields(s)
+        responses = {r.question_id: r for r in s.responses}
+        for q in sorted(s.questions, key=lambda q: q.id):
+            r = responses.get(q.id)
+            options = q.options or {}
+            yield {
+                **session, "question_id": q.id, "difficulty": q.difficulty, "question_text": q.question_text,
+                "option_a": options.get("A"), "option_b": options.get("B"), "option_c": options.get("C"), "option_d": options.get("D"),
+                "correct_answer": q.correct_answer, "selected_answer": r.selected_answer if r else None,
+                "is_correct": r.is_correct if r else None, "answered_at": r.timestamp if r else None,
+                "explanation": q.explanation, "reference_context": q.reference_context,
+            }
+
+    def proctor_rows(self, s: models.QuizSession) -> Iterator[Dict]:
+        session = self.session_fields(s)
+        for log in sorted(s.proctor_logs, key=lambda log: log.id):
+            yield {**session, "log_id": log.id, "violation_type": log.violation_type, "timestamp": log.timestamp}
+
+    def _write_ndjson(self, batches: Iterable[List[models.QuizSession]]) -> Iterator[bytes]:
+        for batch in batches:
+            yield "".join(json.dumps(self.session_record(s)) + "\n" for s in batch).encode()
+
+    def _write_csv(self, batches: Iterable[List[models.QuizSession]], columns: List, row_fn: Callable) -> Iterator[bytes]:
+        names = [name for name, _ in columns]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(names)
+        for batch in batches:
+            for s in batch:
+                for row in row_fn(s):
+                    writer.writerow([_iso(row[n]) if isinstance(row[n], datetime) else row[n] for n in names])
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell(): yield buffer.getvalue().encode()
+
+    def _write_parquet(self, batches: Iterable[List[models.QuizSession]], columns: List, row_fn: Callable) -> Iterator[bytes]:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        types = {"str": pa.string(), "int": pa.int64(), "float": pa.float64(), "bool": pa.bool_(), "time": pa.timestamp("us")}
+        schema = pa.schema([(name, types[kind]) for name, kind in columns])
+        # One row group per database batch; each group's bytes are sent as soon as it is written, the footer last
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, schema)
+        try:
+            for batch in batches:
+                writer.write_table(pa.Table.from_pylist([row for s in batch for row in row_fn(s)], schema=schema))
+                data = sink.drain()
+                if data: yield data
+        finally:
+            writer.close()
+        yield sink.drain()
+
+export_service = ExportService(settings.EXPORT_BATCH_SIZE)
@@ -1,48 +1,67 @@
-import json
-import httpx
-import re
+import logging
 import random
-from typing import List, Dict
-from llama_index.core import Settings
-from llama_index.llms.ollama import Ollama
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Iterator, List
+from app.core.config import settings
 from app.core.exceptions import AIModelError
+from app.core.metrics import GENERATION_ACCEPTED, GENERATION_ATTEMPTS, GENERATION_PARSE_FAILURES, GENERATION_REJECTIONS, GENERATION_RUNS
 from app.schemas.dtos import QuizConfig, DifficultyCount
+from app.services.sampler import ContextSampler
+from app.services.dedup import QuestionDedupIndex
+from app.services.json_stream import extract_question_objects
+from app.services.ingestion import ingestion_service
+from app.services.llm import get_llm
+from app.services.scheduler import AttemptScheduler, DIFFICULTIES
+
+logger = logging.getLogger(__name__)
+
+def question_schema(difficulty: str) -> Dict:
+    return {
+        "type": "object",
+        "properties": {
+            "question_text": {"type": "string"},
+            "options": {
+                "type": "object",
+                "properties": {opt: {"type": "string"} for opt in "ABCD"},
+                "required": list("ABCD"),
+            },
+            "correct_answer": {"type": "string", "enum": list("ABCD")},
+            "difficulty": {"type": "string", "enum": [difficulty]},
+            "explanation": {"type": "string"},
+            "reference_context": {"type": "string"},
+        },
+        "required": ["question_text", "options", "correct_answer", "difficulty", "explanation", "reference_context"],
+    }
 
 class QuizGenerator:
     def __init__(self):
-        self._init_llm()
+        # Shared across requests so the total number of in-flight LLM calls stays bounded
+        self._pool = ThreadPoolExecutor(max_workers=settings.GENERATION_CONCURRENCY, thread_name_prefix="quizgen")
+        # Question bank refills run on a smaller pool of their own and leave the shared one to live requests
+        self._background_pool = ThreadPoolExecutor(max_workers=max(1, settings.BANK_GENERATION_CONCURRENCY), thread_name_prefix="bankgen")
 
-    def _init_llm(self):
-        try:
-            with httpx.Client() as client:
-                response = client.get("http://localhost:11434/api/tags", timeout=5.0)
-                if response.status_code != 200: raise ConnectionError()
-            Settings.llm = Ollama(model="llama3.2:1b", request_timeout=60.0)
-        except Exception:
-            Settings.llm = None
+    def new_dedup_index(self) -> QuestionDedupIndex:
+        return QuestionDedupIndex(ingestion_service.embed_model, settings.DEDUP_SIMILARITY_THRESHOLD)
 
-    def _validate_and_repair(self, text: str, used_concepts: List[str]) -> Dict:
-        try:
-            start_idx = text.find('{')
-            end_idx = text.rfind('}')
-            if start_idx == -1 or end_idx == -1: return None
-            data = json.loads(text[start_idx:end_idx+1])
+    def _extract_items(self, text: str) -> List[Dict]:
+        # Array, {"questions": [...]} wrapper or bare object, with prose around it; a truncated last item is salvaged
+        return extract_question_objects(text)
 
+    def _validate_and_repair(self, data: Dict, difficulty: str = "") -> Dict:
+        try:
             q_text = data.get("question_text", "").lower()
-            if not q_text: return None
+            if not q_text:
+                GENERATION_REJECTIONS.inc(difficulty=difficulty, reason="empty")
+                return None
             
             # Guardrail 1: Filter metadata and institutional branding
             noise = ["data/", "uploads/", ".pdf", "christ university", "excellence", "service", "mission", "vision"]
             if any(word in q_text for word in noise):
-                print("Validation Fail: Question contains forbidden institutional metadata.")
+                logger.debug("Rejected question with institutional metadata: %.80s", q_text)
+                GENERATION_REJECTIONS.inc(difficulty=difficulty, reason="metadata")
                 return None
 
-            # Guardrail 2: Prevent topic repetition
-            concept = " ".join(q_text.split()[:3])
-            if concept in used_concepts:
-                print("Validation Fail: Question topic is a repeat.")
-                return None
-            
             # Repair 1: Ensure all 4 options exist
             opts = data.get("options", {})
             for opt in ["A", "B", "C", "D"]:
@@ -56,9 +75,11 @@ class QuizGenerator:
 
             return data
         except Exception:
+            GENERATION_REJECTIONS.inc(difficulty=difficulty, reason="invalid")
             return None
 
-    def _get_prompt(self, difficulty: str) -> str:
+    def _get_prompt(self, difficulty: str, count: int = 1) -> str:
+        if count > 1: return self._get_batch_prompt(difficulty, count)
         return f"""
         Generate ONE {difficulty.upper()} MCQ from the context.
         Rules:
@@ -78,41 +99,139 @@ class QuizGenerator:
         }}
         """
 
+    def _get_batch_prompt(self, difficulty: str, count: int) -> str:
+        return f"""
+        Generate {count} DIFFERENT {difficulty.upper()} MCQs from the context.
+        Rules:
+        - Each question covers a different concept.
+        - 4 options (A,B,C,D).
+        - No university names.
+        - Focus on technical concepts.
+        - Your response MUST be one JSON object with a "questions" array.
+
+        Format:
+        {{
+            "questions": [
+                {{
+                    "question_text": "...",
+                    "options": {{"A": "...", "B": "...", "C": "...", "D": "..."}},
+                    "correct_answer": "A",
+                    "difficulty": "{difficulty}",
+                    "explanation": "...",
+                    "reference_context": "..."
+                }}
+            ]
+        }}
+        """
+
+    def _get_schema(self, difficulty: str, count: int) -> Dict:
+        # Same shapes as the prompts; servers that support it constrain decoding to this schema
+        if count <= 1: return question_schema(difficulty)
+        return {
+            "type": "object",
+            "properties": {"questions": {"type": "array", "items": question_schema(difficulty), "minItems": count, "maxItems": count}},
+            "required": ["questions"],
+        }
+
+    def _attempt(self, sampler: ContextSampler, diff: str, count: int, deadline: float = None) -> str:
+        # Each attempt gets a fresh slice of the document instead of the same top-k for a fixed query
+        context = sampler.next_window()
+        prompt = (
+            "Context information is below.\n---------------------\n"
+            f"{context}\n---------------------\n"
+            "Using only the context information above and not prior knowledge, follow these instructions.\n"
+            f"{self._get_prompt(diff, count)}"
+        )
+        schema = self._get_schema(diff, count)
+        remaining = None if deadline is None else deadline - time.monotonic()
+        if remaining is None or remaining >= settings.LLM_TIMEOUT: return get_llm().complete(prompt, schema=schema)
+        # Close to the deadline (possibly after queueing behind other requests): one try, cut off when time is up
+        if remaining <= 0: raise AIModelError("Generation deadline passed before the attempt started.")
+        return get_llm().complete(prompt, timeout=max(remaining, 1.0), retries=0, schema=schema)
+
+    def quiz_counts(self, config: QuizConfig) -> DifficultyCount:
+        return config.custom_distribution if config.mode == "custom" else DifficultyCount(easy=10, medium=10, hard=10)
+
     def generate_quiz(self, index, config: QuizConfig) -> List[Dict]:
-        self._init_llm()
-        if Settings.llm is None: raise AIModelError("Ollama not running.")
-
-        counts = config.custom_distribution if config.mode == "custom" else DifficultyCount(easy=10, medium=10, hard=10)
-        all_questions = []
-        used_concepts = []
-
-        for diff in ["easy", "medium", "hard"]:
-            target = getattr(counts, diff)
-            generated = 0
-            attempts = 0
-            while generated < target and attempts < 20: # Max 20 attempts
-                attempts += 1
-                
-                # CRITICAL FIX: Randomize the context to break loops
-                retriever = index.as_retriever(similarity_top_k=5)
-                random_query = f"Generate a random {diff} question about a core topic."
-                nodes = retriever.retrieve(random_query)
-                query_engine = index.as_query_engine(nodes=nodes)
-                
-                print(f"Generating {diff} Q {generated + 1}/{target} (Attempt {attempts})...")
-                try:
-                    response = query_engine.query(self._get_prompt(diff))
-                    q_obj = self._validate_and_repair(str(response), used_concepts)
-                    
-                    if q_obj:
-                        all_questions.append(q_obj)
-                        used_concepts.append(" ".join(q_obj['question_text'].split()[:3]))
-                        generated += 1
-                        print("Success.")
-                except Exception: continue
-
-        if not all_questions:
+        return self.generate_questions(index, self.quiz_counts(config))
+
+    def generate_questions(self, index, counts: DifficultyCount, dedup: QuestionDedupIndex = None, raise_on_empty: bool = True,
+                           scheduler: AttemptScheduler = None, background: bool = False) -> List[Dict]:
+        """Accepted questions carry their unit-normalised question embedding under "embedding"."""
+        scheduler = scheduler or AttemptScheduler(counts)
+        all_questions = sorted(self.iter_questions(index, counts, dedup, scheduler, background), key=lambda q: DIFFICULTIES.index(q['difficulty']))
+        if not all_questions and raise_on_empty and any(getattr(counts, diff) for diff in DIFFICULTIES):
+            if scheduler.stop_reason == "deadline": raise AIModelError("Question generation timed out before any question was accepted.")
             raise AIModelError("The AI failed to generate any valid questions from this document.")
         return all_questions
 
+    def iter_questions(self, index, counts: DifficultyCount, dedup: QuestionDedupIndex = None,
+                       scheduler: AttemptScheduler = None, background: bool = False) -> Iterator[Dict]:
+        """Yield each question as soon as it is accepted, in completion order; the scheduler records why it stopped.
+
+        ``background`` runs the attempts on the bank's pool instead of the one live requests share.
+        """
+        scheduler = scheduler or AttemptScheduler(counts)
+        if sum(scheduler.targets.values()) <= 0: return
+        pool, width = (self._background_pool, max(1, settings.BANK_GENERATION_CONCURRENCY)) if background else (self._pool, settings.GENERATION_CONCURRENCY)
+
+        if not get_llm().healthy(): raise AIModelError("Ollama not running.")
+
+        dedup = dedup or self.new_dedup_index()
+        sampler = ContextSampler.from_index(index, settings.CONTEXT_WINDOW_CHUNKS)
+        if not len(sampler): raise AIModelError("The document has no indexed text to generate questions from.")
+        in_flight = {}
+
+        try:
+            while True:
+                while len(in_flight) < width:
+                    request = scheduler.next_request()
+                    if request is None: break
+                    diff, count = request
+                    GENERATION_ATTEMPTS.inc(difficulty=diff)
+                    logger.debug("Requesting %d %s question(s), %d/%d accepted (attempt %d)", count, diff, scheduler.accepted[diff], scheduler.targets[diff], scheduler.attempts[diff])
+                    in_flight[pool.submit(self._attempt, sampler, diff, count, scheduler.deadline)] = request
+                if not in_flight: break
+
+                # Validation runs on this thread only, so the dedup index never sees concurrent writers
+                done, _ = wait(in_flight, timeout=scheduler.remaining_time(), return_when=FIRST_COMPLETED)
+                if not done and scheduler.expired():
+                    logger.info("Generation deadline reached after %d attempts; returning the questions accepted so far", scheduler.used)
+                    break
+                for future in done:
+                    diff, count = in_flight.pop(future)
+                    try:
+                        items = self._extract_items(future.result())
+                        if not items: GENERATION_PARSE_FAILURES.inc(difficulty=diff)
+                        # Each item stands alone: keep the valid ones, the rest stay open for the next request
+                        candidates = [q for q in (self._validate_and_repair(item, diff) for item in items) if q]
+                        # Guardrail 2: Prevent near-duplicate questions, one batched similarity pass per reply
+                        is_new, vectors = dedup.check([q['question_text'] for q in candidates])
+                    except Exception as e:
+                        logger.warning("%s generation attempt failed: %s", diff, e)
+                        GENERATION_REJECTIONS.inc(difficulty=diff, reason="error")
+                        scheduler.record(diff, count, 0)
+                        continue
+
+                    fresh = []
+                    for q_obj, new, vector in zip(candidates, is_new, vectors):
+                        if scheduler.accepted[diff] + len(fresh) >= scheduler.targets[diff]: break
+                        if not new:
+                            logger.debug("Rejected near-duplicate %s question: %.80s", diff, q_obj["question_text"])
+                            GENERATION_REJECTIONS.inc(difficulty=diff, reason="duplicate")
+                            continue
+                        q_obj["difficulty"] = diff
+                        q_obj["embedding"] = vector
+                        dedup.add(vector)
+                        fresh.append(q_obj)
+                    scheduler.record(diff, count, len(fresh))
+                    for q_obj in fresh:
+                        GENERATION_ACCEPTED.inc(difficulty=diff)
+                        yield q_obj
+            outcome = scheduler.summary()
+            GENERATION_RUNS.inc(status=outcome["status"], reason=outcome["reason"] or "")
+        finally:
+            # A consumer that stops early (client disconnect) or a missed deadline must not leave queued attempts behind
+            for future in in_flight: future.cancel()
+
 generator_service = QuizGenerator()
\ No newline at end of file
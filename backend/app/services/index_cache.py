@@ -0,0 +1,82 @@
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Tuple
+
+class IndexCache:
+    """LRU cache of loaded indices keyed by file_hash, bounded by entry count and on-disk size."""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # file_hash -> (signature, size, index)
+        self._loading: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def signature(persist_dir: Path) -> Tuple[tuple, int]:
+        # Rewriting any index file changes its size or mtime, which invalidates the cached entry
+        stats = [(p.name, p.stat().st_mtime_ns, p.stat().st_size) for p in sorted(persist_dir.iterdir()) if p.is_file()]
+        return tuple(stats), sum(size for _, _, size in stats)
+
+    def get_or_load(self, file_hash: str, persist_dir: Path, loader: Callable):
+        signature, size = self.signature(persist_dir)
+        cached = self._lookup(file_hash, signature)
+        if cached is not None: return cached
+
+        # Single-flight: when a whole class opens the same handout, only one request parses it
+        with self._lock:
+            key_lock = self._loading.setdefault(file_hash, threading.Lock())
+        try:
+            with key_lock:
+                cached = self._lookup(file_hash, signature, count=False)
+                if cached is not None: return cached
+                index = loader()
+                self._store(file_hash, signature, size, index)
+        finally:
+            # Also on a failed load, so the per-key lock does not outlive the attempt
+            with self._lock:
+                self._loading.pop(file_hash, None)
+        return index
+
+    def invalidate(self, file_hash: str):
+        with self._lock:
+            self._drop(file_hash)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "entries": len(self._entries), "bytes": self._bytes,
+                "max_entries": self.max_entries, "max_bytes": self.max_bytes,
+            }
+
+    def _lookup(self, file_hash: str, signature: tuple, count: bool = True):
+        with self._lock:
+            entry = self._entries.get(file_hash)
+            if entry and entry[0] == signature:
+                self._entries.move_to_end(file_hash)
+                if count: self.hits += 1
+                return entry[2]
+            if entry: self._drop(file_hash)
+            if count: self.misses += 1
+            return None
+
+    def _store(self, file_hash: str, signature: tuple, size: int, index):
+        with self._lock:
+            self._drop(file_hash)
+            if self.max_entries <= 0 or size > self.max_bytes: return
+            self._entries[file_hash] = (signature, size, index)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def _drop(self, file_hash: str):
+        entry = self._entries.pop(file_hash, None)
+        if entry: self._bytes -= entry[1]
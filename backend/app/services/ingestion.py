@@ -1,76 +1,231 @@
 import hashlib
-import httpx
+import os
+import io
+import logging
+import shutil
+import tempfile
+import threading
+import time
+import uuid
 from pathlib import Path
-from typing import Tuple
-from llama_index.core import VectorStoreIndex, SimpleDirectoryReader, StorageContext, load_index_from_storage
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-from llama_index.llms.ollama import Ollama
+from typing import BinaryIO, Callable, List, Optional, Tuple
+from fastapi import HTTPException
+from llama_index.core import Document
 from llama_index.core import Settings
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import MetadataMode
 from app.core.config import settings
-from app.core.exceptions import InvalidFileFormat, EmptyContentError, IndexingFailed
+from app.core.metrics import INDEX_LOAD_SECONDS, INGESTION_BYTES, INGESTION_CHUNKS, INGESTION_SECONDS
+from app.core.locks import FileLock
+from app.core.exceptions import InvalidFileFormat, FileTooLarge, EmptyContentError, IndexingFailed
+from app.services.embeddings import build_embed_model
+from app.services.embedding_cache import embedding_cache
+from app.services.index_cache import IndexCache
+from app.services.parsing import document_parser
+from app.services.vector_store import MmapVectorIndex, VectorStoreWriter, migrate_legacy_index
+from app.services.llm import get_llm
+
+logger = logging.getLogger(__name__)
 
 class IngestionService:
     def __init__(self):
-        self.embed_model = HuggingFaceEmbedding(model_name=settings.EMBEDDING_MODEL_NAME)
-        Settings.embed_model = self.embed_model
-        Settings.llm = None
+        self.index_cache = IndexCache(settings.INDEX_CACHE_MAX_ENTRIES, settings.INDEX_CACHE_MAX_MB * 1024 * 1024)
+        self._embed_model = None
+        self._embed_lock = threading.Lock()
+
+    @property
+    def embed_model(self):
+        # Built on first use: importing the service must not pull in sentence-transformers/torch
+        if self._embed_model is None:
+            with self._embed_lock:
+                if self._embed_model is None:
+                    model = build_embed_model()
+                    Settings.embed_model = model
+                    self._embed_model = model
+        return self._embed_model
+
+    @property
+    def embed_model_loaded(self) -> bool:
+        return self._embed_model is not None
 
     def calculate_hash(self, file_content: bytes) -> str:
         return hashlib.sha256(file_content).hexdigest()
 
     def validate_and_save(self, filename: str, content: bytes) -> Tuple[str, Path]:
+        return self.save_stream(filename, io.BytesIO(content))
+
+    def save_stream(self, filename: str, stream: BinaryIO) -> Tuple[str, Path]:
+        """Hash and spool an upload chunk by chunk, then atomically move it to UPLOAD_DIR/<hash><ext>."""
         ext = Path(filename).suffix.lower()
         if ext not in [".pdf", ".docx", ".pptx", ".txt"]:
             raise InvalidFileFormat()
-        file_hash = self.calculate_hash(content)
-        file_path = settings.UPLOAD_DIR / f"{file_hash}{ext}"
-        if not file_path.exists():
-            with open(file_path, "wb") as f:
-                f.write(content)
-        return file_hash, file_path
-
-    def generate_title(self, file_path: Path) -> str:
+        max_bytes = settings.MAX_UPLOAD_MB * 1024 * 1024
+        hasher = hashlib.sha256()
+        size = 0
+        # Temp file lives in UPLOAD_DIR so the final rename never crosses filesystems
+        fd, tmp_name = tempfile.mkstemp(dir=settings.UPLOAD_DIR, suffix=".part")
+        tmp_path = Path(tmp_name)
         try:
-            with httpx.Client() as client:
-                response = client.get("http://localhost:11434/api/tags", timeout=5.0)
-                if response.status_code != 200: return file_path.stem
+            with os.fdopen(fd, "wb") as out:
+                while chunk := stream.read(settings.UPLOAD_CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > max_bytes: raise FileTooLarge(f"File exceeds the {settings.MAX_UPLOAD_MB} MB upload limit.")
+                    hasher.update(chunk)
+                    out.write(chunk)
+            INGESTION_BYTES.inc(size)
+            file_hash = hasher.hexdigest()
+            file_path = settings.UPLOAD_DIR / f"{file_hash}{ext}"
+            if not file_path.exists():
+                os.replace(tmp_path, file_path)
+            return file_hash, file_path
+        finally:
+            tmp_path.unlink(missing_ok=True)
 
-            reader = SimpleDirectoryReader(input_files=[str(file_path)])
-            documents = reader.load_data()
-            if not documents: return file_path.stem
+    def extract_sample(self, file_path: Path) -> str:
+        pages = document_parser.iter_pages(file_path)
+        try:
+            return next((page.text[:800] for page in pages if page.text.strip()), "")
+        finally:
+            pages.close()
+
+    def generate_title(self, sample_text: str, fallback: str) -> str:
+        try:
+            llm = get_llm()
+            if not llm.healthy() or not sample_text.strip(): return fallback
 
-            sample_text = documents[0].text[:800]
-            llm = Ollama(model="llama3.2:1b", request_timeout=30.0)
             prompt = f"Identify the subject of this text. IGNORE university names. Return ONLY a 3-word title. Text: {sample_text}"
             
-            response = llm.complete(prompt)
+            response = llm.complete(prompt, timeout=30.0, retries=0)
             title = str(response).strip().replace('"', '').replace("'", "")
             if any(x in title.lower() for x in ["christ", "university", "excellence"]):
                 return "Domain Assessment"
             return title if len(title) < 40 else "Knowledge Review"
         except Exception:
-            return file_path.stem
+            return fallback
 
-    def create_index(self, file_hash: str, file_path: Path) -> str:
+    def create_index(self, file_hash: str, file_path: Path, progress: Optional[Callable[[str, float], None]] = None) -> Tuple[str, str]:
+        """Build the index once per hash; returns (index path, text sample used for titling)."""
         persist_dir = settings.INDEX_DIR / file_hash
-        if persist_dir.exists(): return str(persist_dir)
+        if persist_dir.exists(): return str(persist_dir), self.extract_sample(file_path)
+        # Another worker process may be indexing the same upload: wait for it and reuse its index instead of building twice
+        lock = FileLock(settings.LOCK_DIR / f"index-{file_hash}.lock", timeout=settings.INDEX_LOCK_TIMEOUT)
+        if not lock.acquire(): raise IndexingFailed("Timed out waiting for another worker to index this document.")
+        try:
+            if persist_dir.exists(): return str(persist_dir), self.extract_sample(file_path)
+            return self._build_index(file_hash, file_path, persist_dir, progress)
+        finally:
+            lock.release()
+
+    def _build_index(self, file_hash: str, file_path: Path, persist_dir: Path, progress: Optional[Callable[[str, float], None]]) -> Tuple[str, str]:
+        # Persist into a private directory and rename it into place, so a half-written index is never visible
+        tmp_dir = settings.INDEX_DIR / f".{file_hash}.{uuid.uuid4().hex}.tmp"
+        started = time.perf_counter()
         try:
-            reader = SimpleDirectoryReader(input_files=[str(file_path)])
-            documents = reader.load_data()
-            if not documents or all(not doc.text.strip() for doc in documents):
+            # Pages stream in from the parser pool and are chunked as they arrive; only one embedding batch is pending
+            writer = VectorStoreWriter(tmp_dir, settings.VECTOR_STORE_DTYPE)
+            splitter = SentenceSplitter()
+            sample, batch, chunks = "", [], 0
+            for page in document_parser.iter_pages(file_path):
+                if not page.text.strip(): continue
+                sample = sample or page.text[:800]
+                document = Document(
+                    text=page.text, metadata={"file_name": file_path.name, "page_label": str(page.number)},
+                    # Page labels stay out of the embedded text so a chunk keeps its cache key when pages shift
+                    excluded_embed_metadata_keys=["file_name", "page_label"], excluded_llm_metadata_keys=["file_name"]
+                )
+                batch.extend(splitter.get_nodes_from_documents([document]))
+                if len(batch) >= settings.EMBED_BATCH_SIZE:
+                    chunks += self._embed_and_write(writer, batch)
+                    batch = []
+                if progress: progress("parsing", page.progress)
+            chunks += self._embed_and_write(writer, batch)
+            if not chunks:
+                writer.abort()
                 if file_path.exists(): file_path.unlink()
                 raise EmptyContentError()
-            index = VectorStoreIndex.from_documents(documents)
-            persist_dir.mkdir(parents=True, exist_ok=True)
-            index.storage_context.persist(persist_dir=persist_dir)
-            return str(persist_dir)
+
+            if progress: progress("persisting", 1.0)
+            writer.close(embed_model=self.embed_model_name)
+            if persist_dir.exists():
+                # Rebuild of a stale index (callers hold the per-hash lock): swap so readers see the old or the new one
+                stale_dir = settings.INDEX_DIR / f".{file_hash}.{uuid.uuid4().hex}.stale"
+                os.replace(persist_dir, stale_dir)
+                os.replace(tmp_dir, persist_dir)
+                shutil.rmtree(stale_dir, ignore_errors=True)
+            else:
+                tmp_dir.rename(persist_dir)
+            INGESTION_CHUNKS.inc(chunks)
+            embedding_cache.prune()
+            INGESTION_SECONDS.observe(time.perf_counter() - started)
+            return str(persist_dir), sample
+        except HTTPException:
+            raise
         except Exception as e:
             raise IndexingFailed(detail=str(e))
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _embed_and_write(self, writer: VectorStoreWriter, nodes: List) -> int:
+        # Cached chunks are reused; the rest go through one batched embedding call, appended straight to the on-disk matrix
+        if not nodes: return 0
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+        embeddings = embedding_cache.embed(self.embed_model, self.embed_model_name, texts)
+        writer.add([node.get_content() for node in nodes], [node.metadata for node in nodes], embeddings)
+        return len(nodes)
+
+    def find_upload(self, file_hash: str) -> Optional[Path]:
+        for ext in [".pdf", ".docx", ".pptx", ".txt"]:
+            file_path = settings.UPLOAD_DIR / f"{file_hash}{ext}"
+            if file_path.exists(): return file_path
+        return None
 
-    def get_index(self, file_hash: str):
+    @property
+    def embed_model_name(self) -> str:
+        return settings.EMBEDDING_MODEL_NAME if settings.EMBEDDING_BACKEND != "hash" else "hash"
+
+    def get_index(self, file_hash: str) -> Optional[MmapVectorIndex]:
         persist_dir = settings.INDEX_DIR / file_hash
         if not persist_dir.exists(): return None
-        storage_context = StorageContext.from_defaults(persist_dir=persist_dir)
-        return load_index_from_storage(storage_context)
+        load = lambda: self.index_cache.get_or_load(file_hash, persist_dir, lambda: MmapVectorIndex(persist_dir, self.embed_model))
+        with INDEX_LOAD_SECONDS.time():
+            if not MmapVectorIndex.exists(persist_dir) and not self._migrate(file_hash, persist_dir):
+                self._rebuild(file_hash, persist_dir, "is incomplete")
+            index = load()
+            indexed_with = index.manifest.get("embed_model")
+            if indexed_with != self.embed_model_name:
+                # Vectors from another embedding model have another dimension (or geometry) than the query vectors
+                self._rebuild(file_hash, persist_dir, f"was built with the '{indexed_with}' embedding model")
+                index = load()
+            return index
+
+    def _index_current(self, persist_dir: Path) -> bool:
+        manifest = MmapVectorIndex.read_manifest(persist_dir)
+        return manifest is not None and manifest.get("embed_model") == self.embed_model_name
+
+    def _rebuild(self, file_hash: str, persist_dir: Path, reason: str):
+        file_path = self.find_upload(file_hash)
+        if not file_path: raise IndexingFailed(f"The index for this document {reason} and its upload is missing; upload it again.")
+        lock = FileLock(settings.LOCK_DIR / f"index-{file_hash}.lock", timeout=settings.INDEX_LOCK_TIMEOUT)
+        if not lock.acquire(): raise IndexingFailed("Timed out waiting for another worker to index this document.")
+        try:
+            if not self._index_current(persist_dir):
+                logger.warning("Re-indexing %s: index %s", file_hash, reason)
+                self._build_index(file_hash, file_path, persist_dir, None)
+        finally:
+            lock.release()
+        self.index_cache.invalidate(file_hash)
+
+    def _migrate(self, file_hash: str, persist_dir: Path) -> bool:
+        """Convert an index persisted by LlamaIndex's JSON stores, once, on first use; False if there is nothing to convert."""
+        # Per-hash lock only: threads and workers migrating other documents proceed in parallel
+        lock = FileLock(settings.LOCK_DIR / f"index-{file_hash}.lock", timeout=settings.INDEX_LOCK_TIMEOUT)
+        if not lock.acquire(): raise IndexingFailed("Timed out waiting for another worker to convert this document's index.")
+        try:
+            if MmapVectorIndex.exists(persist_dir): return True
+            if not migrate_legacy_index(persist_dir, self.embed_model, settings.VECTOR_STORE_DTYPE, embed_model=self.embed_model_name): return False
+            self.index_cache.invalidate(file_hash)
+            return True
+        finally:
+            lock.release()
 
-ingestion_service = IngestionService()
\ No newline at end of file
+ingestion_service = IngestionService()
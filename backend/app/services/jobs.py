@@ -0,0 +1,187 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Optional
+from fastapi import HTTPException
+from app.core.config import settings
+from app.core.locks import FileLock
+
+ACTIVE_STATUSES = ("QUEUED", "RUNNING")
+
+class Job:
+    def __init__(self, kind: str, key: str, store: Optional["JobStore"] = None):
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.key = key
+        self.status = "QUEUED"
+        self.stage = "queued"
+        self.progress = 0.0
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+        self._store = store
+        self._saved_at = 0.0
+
+    def update(self, stage: str, progress: float):
+        changed = stage != self.stage
+        self.stage, self.progress = stage, min(max(progress, 0.0), 1.0)
+        # Per-page progress would rewrite the state file hundreds of times; stage changes always go out
+        if self._store and (changed or time.monotonic() - self._saved_at >= 0.5): self.save()
+
+    def save(self):
+        if not self._store: return
+        self._saved_at = time.monotonic()
+        self._store.save(self)
+
+    def to_state(self) -> Dict:
+        return {
+            "id": self.id, "kind": self.kind, "key": self.key, "status": self.status, "stage": self.stage,
+            "progress": self.progress, "error": self.error, "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict) -> "Job":
+        job = cls(state["kind"], state["key"])
+        job.id, job.status, job.stage, job.progress, job.error = state["id"], state["status"], state["stage"], state["progress"], state["error"]
+        job.created_at = datetime.fromisoformat(state["created_at"])
+        job.finished_at = datetime.fromisoformat(state["finished_at"]) if state["finished_at"] else None
+        return job
+
+class JobStore:
+    """Job state as small JSON files in one directory, so any worker process can report on a job another one runs.
+
+    The submitting process holds ``<id>.lock`` until the job ends; the OS drops it if that process dies, and a job
+    still marked active without its lock holder is reported as failed.
+    """
+
+    def __init__(self, directory: Path, ttl: float):
+        self.directory = directory
+        self.ttl = ttl
+
+    def claim(self, job: Job) -> FileLock:
+        lock = FileLock(self.directory / f"{job.id}.lock")
+        lock.acquire(blocking=False)  # A fresh id: nobody else holds it
+        return lock
+
+    def save(self, job: Job):
+        self._write(f"{job.id}.json", json.dumps(job.to_state()))
+
+    def mark_active(self, job: Job):
+        # Points (kind, key) at its latest job for other workers' dedup and "still indexing" checks
+        self._write(f"{job.kind}-{job.key}.active", job.id)
+
+    def _write(self, name: str, content: str):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as out:
+                out.write(content)
+            os.replace(tmp_name, self.directory / name)
+        except OSError:
+            # Windows refuses to replace a file a reader has open; the next update tries again
+            Path(tmp_name).unlink(missing_ok=True)
+
+    def load(self, job_id: str) -> Optional[Job]:
+        try:
+            uuid.UUID(job_id)  # Ids come from the URL; never let one name a path outside the store
+            job = Job.from_state(json.loads((self.directory / f"{job_id}.json").read_text()))
+        except (ValueError, OSError):
+            return None
+        if job.status in ACTIVE_STATUSES and not self._held(job.id):
+            job.status, job.error = "FAILED", "The worker running this job stopped before it finished."
+        return job
+
+    def active(self, kind: str, key: str) -> Optional[Job]:
+        try:
+            job_id = (self.directory / f"{kind}-{key}.active").read_text().strip()
+        except OSError:
+            return None
+        job = self.load(job_id)
+        return job if job and job.status in ACTIVE_STATUSES else None
+
+    def _held(self, job_id: str) -> bool:
+        lock = FileLock(self.directory / f"{job_id}.lock")
+        if not lock.acquire(blocking=False): return True
+        lock.release()
+        return False
+
+    def prune(self):
+        """Delete state, pointer and lock files untouched for longer than ``ttl``."""
+        cutoff = time.time() - self.ttl
+        for path in self.directory.glob("*"):
+            try:
+                if path.stat().st_mtime < cutoff and not (path.suffix == ".lock" and self._held(path.stem)): path.unlink()
+            except OSError:
+                pass
+
+class JobQueue:
+    """Worker pool for slow background work, deduplicated on (kind, key) while a job is in flight.
+
+    With a ``store``, job state is shared with every worker process: ``get`` and ``active`` see jobs other processes
+    run, and a submit attaches to one already in flight elsewhere.
+    """
+
+    def __init__(self, max_workers: int, max_history: int = 500, store: Optional[JobStore] = None):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="jobs")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._active: Dict[tuple, Job] = {}
+        self._lock = threading.Lock()
+        self._max_history = max_history
+        self._store = store
+
+    def submit(self, kind: str, key: str, fn: Callable[[Job], None]) -> Job:
+        with self._lock:
+            active = self._active.get((kind, key)) or (self._store.active(kind, key) if self._store else None)
+            if active: return active
+            job = Job(kind, key, self._store)
+            self._jobs[job.id] = job
+            self._active[(kind, key)] = job
+            while len(self._jobs) > self._max_history:
+                self._jobs.popitem(last=False)
+            claim = None
+            if self._store:
+                self._store.prune()
+                claim = self._store.claim(job)
+                job.save()
+                self._store.mark_active(job)
+        self._pool.submit(self._run, job, fn, claim)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job or (self._store.load(job_id) if self._store else None)
+
+    def active(self, kind: str, key: str) -> Optional[Job]:
+        with self._lock:
+            job = self._active.get((kind, key))
+        return job or (self._store.active(kind, key) if self._store else None)
+
+    def _run(self, job: Job, fn: Callable[[Job], None], claim: Optional[FileLock] = None):
+        job.status = "RUNNING"
+        job.save()
+        try:
+            fn(job)
+            job.status = "COMPLETED"
+            job.update("done", 1.0)
+        except HTTPException as e:
+            job.status, job.error = "FAILED", str(e.detail)
+        except Exception as e:
+            job.status, job.error = "FAILED", str(e)
+        finally:
+            job.finished_at = datetime.utcnow()
+            job.save()
+            with self._lock:
+                self._active.pop((job.kind, job.key), None)
+            if claim: claim.release()
+
+# Ingestion status is polled by the upload page and may land on any worker, so its state lives on disk
+job_queue = JobQueue(settings.INGESTION_WORKERS, store=JobStore(settings.LOCK_DIR / "jobs", settings.JOB_STATE_TTL))
@@ -0,0 +1,86 @@
+import json
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+def _closers(openers: Sequence[str]) -> str:
+    return "".join("}" if c == "{" else "]" for c in reversed(openers))
+
+class QuestionObjectStream:
+    """Incremental, tolerant extractor of question objects from raw LLM text.
+
+    Feed the reply as it arrives (or all at once). Every complete object carrying ``key`` is returned as soon as its
+    closing brace is seen, whether it is a bare object, an array element or wrapped in {"questions": [...]}, and
+    regardless of surrounding prose or code fences. ``close()`` salvages a truncated final object by cutting back
+    to its last complete member and closing the open brackets.
+    """
+
+    def __init__(self, key: str = "question_text", salvage_keys: Sequence[str] = ("question_text", "options", "correct_answer")):
+        self.key = key
+        self.salvage_keys = salvage_keys
+        self._text = ""
+        self._stack: List[Tuple[str, int]] = []             # (opener, index) of open brackets
+        self._commas: List[Tuple[int, Tuple[str, ...]]] = []  # member boundaries inside the open structure
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> List[Dict]:
+        emitted = []
+        offset = len(self._text)
+        self._text += chunk
+        for i, ch in enumerate(chunk, offset):
+            if self._in_string:
+                if self._escape: self._escape = False
+                elif ch == "\\": self._escape = True
+                elif ch == '"': self._in_string = False
+                continue
+            # Quotes in prose outside any JSON structure do not start a string
+            if ch == '"':
+                self._in_string = bool(self._stack)
+            elif ch in "{[":
+                self._stack.append((ch, i))
+            elif ch in "}]":
+                opener = "{" if ch == "}" else "["
+                while self._stack and self._stack[-1][0] != opener: self._stack.pop()
+                if not self._stack: continue
+                _, begin = self._stack.pop()
+                if ch == "}":
+                    obj = self._load(self._text[begin:i + 1])
+                    if self._is_question(obj): emitted.append(obj)
+                if not self._stack: self._commas = []
+            elif ch == "," and self._stack:
+                self._commas.append((i, tuple(c for c, _ in self._stack)))
+        return emitted
+
+    def close(self) -> List[Dict]:
+        """Best-effort recovery of the unfinished object at the end of a truncated reply."""
+        if not self._stack: return []
+        for depth, (opener, begin) in enumerate(self._stack):
+            if opener != "{": continue
+            open_here = [c for c, _ in self._stack[depth:]]
+            attempts = [self._text[begin:] + ('"' if self._in_string else "") + _closers(open_here)]
+            # Otherwise drop the half-written member: cut at the last comma inside this object
+            for index, snapshot in reversed(self._commas[-16:]):
+                if index > begin and len(snapshot) > depth:
+                    attempts.append(self._text[begin:index] + _closers(snapshot[depth:]))
+            for candidate in attempts:
+                obj = self._load(candidate)
+                if self._is_question(obj) and all(obj.get(k) for k in self.salvage_keys): return [obj]
+        return []
+
+    def _is_question(self, obj: Optional[Dict]) -> bool:
+        return isinstance(obj, dict) and self.key in obj
+
+    @staticmethod
+    def _load(text: str) -> Optional[Dict]:
+        for candidate in (text, _TRAILING_COMMA.sub(r"\1", text)):
+            try:
+                return json.loads(candidate)
+            except ValueError:
+                continue
+        return None
+
+def extract_question_objects(text: str) -> List[Dict]:
+    stream = QuestionObjectStream()
+    return stream.feed(text) + stream.close()
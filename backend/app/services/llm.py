@@ -0,0 +1,212 @@
+import abc
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from typing import Optional
+import httpx
+from app.core.config import settings
+from app.core.exceptions import AIModelError
+from app.core.locks import FileSemaphore
+from app.core.metrics import LLM_SECONDS
+
+logger = logging.getLogger(__name__)
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures; after `cooldown` seconds one probe call is let through."""
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None: return "closed"
+            return "half-open" if time.monotonic() - self._opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None: return True
+            if time.monotonic() - self._opened_at < self.cooldown or self._probing: return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures, self._opened_at, self._probing = 0, None, False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+class LLMBackend(abc.ABC):
+    name = "base"
+
+    @abc.abstractmethod
+    def healthy(self, force: bool = False) -> bool:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def complete(self, prompt: str, timeout: Optional[float] = None, retries: Optional[int] = None, schema: Optional[dict] = None) -> str:
+        """``schema`` asks for output constrained to that JSON schema where the backend supports it."""
+        raise NotImplementedError
+
+    def status(self) -> dict:
+        return {"backend": self.name, "healthy": self.healthy()}
+
+class OllamaBackend(LLMBackend):
+    """Ollama over one pooled httpx client, with a TTL-cached health probe and a circuit breaker."""
+    name = "ollama"
+
+    def __init__(self, base_url: str, model: str):
+        self.model = model
+        self._client = httpx.Client(
+            base_url=base_url, timeout=settings.LLM_TIMEOUT,
+            limits=httpx.Limits(max_connections=settings.LLM_MAX_CONNECTIONS, max_keepalive_connections=settings.LLM_MAX_CONNECTIONS)
+        )
+        self.breaker = CircuitBreaker(settings.LLM_BREAKER_THRESHOLD, settings.LLM_BREAKER_COOLDOWN)
+        # Shared by every worker process, so N workers cannot put N times the load on the one model server
+        self._slots = FileSemaphore(settings.LOCK_DIR / "llm", settings.LLM_GLOBAL_CONCURRENCY) if settings.LLM_GLOBAL_CONCURRENCY > 0 else None
+        self._health = (0.0, False)
+        self._health_lock = threading.Lock()
+        # Cleared the first time the server rejects a schema in "format"; later calls go straight to "json"
+        self._schema_format = settings.LLM_STRUCTURED_OUTPUT == "schema"
+
+    def healthy(self, force: bool = False) -> bool:
+        checked_at, ok = self._health
+        if not force and time.monotonic() - checked_at < settings.LLM_HEALTH_TTL: return ok
+        with self._health_lock:
+            checked_at, ok = self._health
+            if not force and time.monotonic() - checked_at < settings.LLM_HEALTH_TTL: return ok
+            try:
+                ok = self._client.get("/api/tags", timeout=settings.LLM_HEALTH_TIMEOUT).status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            self._health = (time.monotonic(), ok)
+            return ok
+
+    def complete(self, prompt: str, timeout: Optional[float] = None, retries: Optional[int] = None, schema: Optional[dict] = None) -> str:
+        started = time.perf_counter()
+        try:
+            text = self._complete(prompt, timeout, retries, schema)
+        except AIModelError:
+            LLM_SECONDS.observe(time.perf_counter() - started, backend=self.name, outcome="error")
+            raise
+        LLM_SECONDS.observe(time.perf_counter() - started, backend=self.name, outcome="ok")
+        return text
+
+    def _complete(self, prompt: str, timeout: Optional[float], retries: Optional[int], schema: Optional[dict]) -> str:
+        retries = settings.LLM_RETRIES if retries is None else retries
+        body = {"model": self.model, "prompt": prompt, "stream": False}
+        # "schema" constrains decoding to the JSON schema (Ollama >= 0.5); "json" only guarantees well-formed JSON
+        if schema is not None and self._schema_format: body["format"] = schema
+        elif schema is not None and settings.LLM_STRUCTURED_OUTPUT != "off": body["format"] = "json"
+        last_error = None
+        for attempt in range(retries + 1):
+            # Fail fast while the model server is known to be down instead of queueing multi-second timeouts
+            if self.breaker.state == "open": raise AIModelError("Model server is unavailable; retrying shortly.")
+            # Waiting for a slot counts against the call's timeout; a full server is not a failure of the server
+            budget = timeout or settings.LLM_TIMEOUT
+            waited = time.monotonic()
+            slot = self._slots.acquire(budget) if self._slots else None
+            if self._slots and slot is None: raise AIModelError("Model server is busy; try again shortly.")
+            try:
+                # Checked once a slot is held, so a half-open probe is never left pending by a slot timeout
+                if not self.breaker.allow(): raise AIModelError("Model server is unavailable; retrying shortly.")
+                response = self._client.post(
+                    "/api/generate", json=body,
+                    timeout=max(budget - (time.monotonic() - waited), 1.0)
+                )
+                if response.is_client_error and isinstance(body.get("format"), dict):
+                    # Ollama < 0.5 answers 400 to a schema "format": not an outage, so no retry or breaker failure
+                    logger.warning("Model server rejected schema-constrained output (%s); falling back to JSON mode", response.status_code)
+                    self._schema_format = False
+                    body["format"] = "json"
+                    response = self._client.post(
+                        "/api/generate", json=body,
+                        timeout=max(budget - (time.monotonic() - waited), 1.0)
+                    )
+                response.raise_for_status()
+                text = response.json().get("response", "")
+                self.breaker.record_success()
+                return text
+            except (httpx.HTTPError, ValueError) as e:
+                last_error = e
+                self.breaker.record_failure()
+            finally:
+                if slot: slot.release()
+            if attempt < retries: time.sleep(min(0.5 * 2 ** attempt, 4.0))
+        self._health = (time.monotonic(), False)
+        raise AIModelError(f"Model server request failed: {last_error}")
+
+    def status(self) -> dict:
+        return {"backend": self.name, "model": self.model, "healthy": self.healthy(), "circuit": self.breaker.state}
+
+class FakeLLMBackend(LLMBackend):
+    """Deterministic offline stand-in: builds well-formed MCQs from the prompt's context. For tests and benchmarks."""
+    name = "fake"
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def healthy(self, force: bool = False) -> bool:
+        return True
+
+    def complete(self, prompt: str, timeout: Optional[float] = None, retries: Optional[int] = None, schema: Optional[dict] = None) -> str:
+        self.calls += 1
+        if self.latency: time.sleep(self.latency)
+        LLM_SECONDS.observe(self.latency, backend=self.name, outcome="ok")
+        seed = int(hashlib.sha256(prompt.encode()).hexdigest(), 16)
+        if "3-word title" in prompt:
+            words = re.findall(r"[A-Za-z]{4,}", prompt.split("Text:", 1)[-1])[:3] or ["Knowledge", "Review", "Quiz"]
+            return " ".join(word.capitalize() for word in words)
+
+        context = prompt.split("---------------------")[1] if prompt.count("---------------------") >= 2 else prompt
+        sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+|\n+", context) if len(s.split()) >= 4] or ["The document has no usable sentences."]
+        count_match = re.search(r"Generate (\d+|ONE) ", prompt)
+        count = 1 if not count_match or count_match.group(1) == "ONE" else int(count_match.group(1))
+        diff_match = re.search(r"\b(EASY|MEDIUM|HARD)\b", prompt)
+        difficulty = diff_match.group(1).lower() if diff_match else "easy"
+
+        items = []
+        for i in range(count):
+            sentence = sentences[(seed + i) % len(sentences)]
+            items.append({
+                "question_text": f"Which statement about '{' '.join(sentence.split()[:8])}' is correct? ({difficulty} #{seed % 9973 + i})",
+                "options": {"A": sentence[:120], "B": "It is unrelated to the topic.", "C": "It is never discussed.", "D": "None of the above."},
+                "correct_answer": "A",
+                "difficulty": difficulty,
+                "explanation": "The context states it directly.",
+                "reference_context": sentence[:200]
+            })
+        if count == 1: return json.dumps(items[0])
+        # Mirrors the batch schema's {"questions": [...]} wrapper when structured output was requested
+        return json.dumps({"questions": items} if schema is not None else items)
+
+_backend: Optional[LLMBackend] = None
+_backend_lock = threading.Lock()
+
+def get_llm() -> LLMBackend:
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = FakeLLMBackend() if settings.LLM_BACKEND == "fake" else OllamaBackend(settings.OLLAMA_BASE_URL, settings.LLM_MODEL)
+    return _backend
+
+def set_llm(backend: LLMBackend):
+    """Swap the process-wide backend (tests, benchmarks)."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
@@ -0,0 +1,99 @@
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterator, List, NamedTuple, Optional, Tuple
+from app.core.config import settings
+
+class Page(NamedTuple):
+    number: int      # 1-based page, slide or block number
+    text: str
+    progress: float  # fraction of the document parsed once this page is consumed
+
+# Workers are spawned, not forked, so they import only this module; parser libraries load inside the worker
+def _pdf_page_count(path: str) -> int:
+    from pypdf import PdfReader
+    return len(PdfReader(path).pages)
+
+def _parse_pdf_pages(path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    from pypdf import PdfReader
+    reader = PdfReader(path)
+    return [(i + 1, reader.pages[i].extract_text() or "") for i in range(start, end)]
+
+class DocumentParser:
+    """Streams a document page by page; PDF pages are parsed in ranges across a process pool."""
+
+    def __init__(self, max_workers: int, pages_per_task: int):
+        self.max_workers = max_workers
+        self.pages_per_task = max(1, pages_per_task)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def iter_pages(self, file_path: Path) -> Iterator[Page]:
+        ext = file_path.suffix.lower()
+        if ext == ".pdf":
+            yield from self._fan_out(_parse_pdf_pages, str(file_path), _pdf_page_count(str(file_path)))
+        elif ext == ".pptx":
+            yield from self._iter_pptx(file_path)
+        elif ext == ".docx":
+            yield from self._iter_docx(file_path)
+        else:
+            yield from self._iter_text(file_path)
+
+    def _fan_out(self, parse: Callable, path: str, total: int) -> Iterator[Page]:
+        ranges = [(start, min(start + self.pages_per_task, total)) for start in range(0, total, self.pages_per_task)]
+        if self.max_workers <= 1 or len(ranges) <= 1:
+            for start, end in ranges:
+                for number, text in parse(path, start, end): yield Page(number, text, number / total)
+            return
+
+        # At most two ranges per worker are parsed ahead of the consumer, so memory stays bounded
+        pool = self._get_pool()
+        todo = iter(ranges)
+        pending = deque(pool.submit(parse, path, *r) for _, r in zip(range(self.max_workers * 2), todo))
+        try:
+            while pending:
+                pages = pending.popleft().result()
+                nxt = next(todo, None)
+                if nxt: pending.append(pool.submit(parse, path, *nxt))
+                for number, text in pages: yield Page(number, text, number / total)
+        finally:
+            for future in pending: future.cancel()
+
+    def _iter_pptx(self, file_path: Path) -> Iterator[Page]:
+        # Opening a PPTX unzips and parses the whole package, so one pass here beats reopening it per range in workers
+        from pptx import Presentation
+        slides = Presentation(str(file_path)).slides
+        total = len(slides)
+        for number, slide in enumerate(slides, 1):
+            yield Page(number, "\n".join(shape.text_frame.text for shape in slide.shapes if shape.has_text_frame), number / total)
+
+    def _iter_docx(self, file_path: Path) -> Iterator[Page]:
+        # DOCX has no stored pagination; groups of paragraphs stand in for pages
+        import docx
+        paragraphs = [p.text for p in docx.Document(str(file_path)).paragraphs]
+        step = settings.PARSE_DOCX_PARAGRAPHS
+        for number, start in enumerate(range(0, len(paragraphs), step), 1):
+            yield Page(number, "\n".join(paragraphs[start:start + step]), min(start + step, len(paragraphs)) / len(paragraphs))
+
+    def _iter_text(self, file_path: Path) -> Iterator[Page]:
+        size = file_path.stat().st_size or 1
+        block, block_bytes, consumed, number = [], 0, 0, 0
+        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                block.append(line)
+                block_bytes += len(line)
+                if block_bytes >= settings.PARSE_TEXT_BLOCK_BYTES:
+                    number, consumed = number + 1, consumed + block_bytes
+                    yield Page(number, "".join(block), min(consumed / size, 1.0))
+                    block, block_bytes = [], 0
+        if block: yield Page(number + 1, "".join(block), 1.0)
+
+document_parser = DocumentParser(settings.INGESTION_PARSE_WORKERS, settings.PARSE_PAGES_PER_TASK)
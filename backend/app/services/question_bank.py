@@ -0,0 +1,125 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db import models
+from app.db.session import SessionLocal
+from app.schemas.dtos import DifficultyCount
+from app.services.generator import generator_service, DIFFICULTIES
+from app.services.ingestion import ingestion_service
+from app.services.jobs import Job, JobQueue
+from app.services.dedup import QuestionDedupIndex
+
+class QuestionBankService:
+    """Pre-generated questions per document and difficulty, drawn least-served first and retired after BANK_MAX_SERVES."""
+
+    def __init__(self):
+        self._queue = JobQueue(settings.BANK_WORKERS)
+
+    def _to_dict(self, row: models.BankQuestion) -> Dict:
+        return {
+            "question_text": row.question_text, "options": row.options, "correct_answer": row.correct_answer,
+            "difficulty": row.difficulty, "explanation": row.explanation, "reference_context": row.reference_context,
+            "embedding": row.embedding
+        }
+
+    def _live(self, db: Session, file_hash: str):
+        return db.query(models.BankQuestion).filter(
+            models.BankQuestion.file_hash == file_hash,
+            models.BankQuestion.served_count < settings.BANK_MAX_SERVES
+        )
+
+    def _retired(self, db: Session, file_hash: str):
+        return db.query(models.BankQuestion).filter(
+            models.BankQuestion.file_hash == file_hash,
+            models.BankQuestion.served_count >= settings.BANK_MAX_SERVES
+        )
+
+    def prune_retired(self, db: Session, file_hash: str) -> int:
+        """Delete the document's retired questions beyond the newest BANK_RETIRED_KEEP."""
+        cutoff = self._retired(db, file_hash).with_entities(models.BankQuestion.id).order_by(
+            models.BankQuestion.id.desc()
+        ).offset(settings.BANK_RETIRED_KEEP).limit(1).scalar()
+        if cutoff is None: return 0
+        return self._retired(db, file_hash).filter(models.BankQuestion.id <= cutoff).delete(synchronize_session=False)
+
+    def draw(self, db: Session, file_hash: str, counts: DifficultyCount) -> Tuple[List[Dict], DifficultyCount]:
+        """Take up to the requested questions from the bank; returns them with the per-difficulty shortfall."""
+        if not settings.BANK_ENABLED: return [], counts
+        drawn, shortfall = [], {}
+        for diff in DIFFICULTIES:
+            wanted = getattr(counts, diff)
+            rows = []
+            if wanted > 0:
+                rows = self._live(db, file_hash).filter(models.BankQuestion.difficulty == diff).order_by(
+                    models.BankQuestion.served_count, func.random()
+                ).limit(wanted).all()
+            for row in rows:
+                row.served_count += 1
+                drawn.append(self._to_dict(row))
+            shortfall[diff] = wanted - len(rows)
+        return drawn, DifficultyCount(**shortfall)
+
+    def available(self, db: Session, file_hash: str) -> Dict[str, int]:
+        rows = self._live(db, file_hash).with_entities(
+            models.BankQuestion.difficulty, func.count(models.BankQuestion.id)
+        ).group_by(models.BankQuestion.difficulty).all()
+        counts = {diff: 0 for diff in DIFFICULTIES}
+        counts.update({diff: n for diff, n in rows})
+        return counts
+
+    def needs_refill(self, db: Session, file_hash: str) -> bool:
+        if not settings.BANK_ENABLED: return False
+        return any(n < settings.BANK_LOW_WATERMARK for n in self.available(db, file_hash).values())
+
+    def dedup_index(self, db: Session, file_hash: str, drawn: Sequence[Dict] = ()) -> QuestionDedupIndex:
+        """Dedup index seeded with the document's live and most recently retired banked questions (or just the drawn ones when history is off)."""
+        dedup = generator_service.new_dedup_index()
+        if settings.DEDUP_DOCUMENT_HISTORY:
+            columns = (models.BankQuestion.question_text, models.BankQuestion.embedding)
+            rows = self._live(db, file_hash).with_entities(*columns).all() + self._retired(db, file_hash).with_entities(*columns).order_by(
+                models.BankQuestion.id.desc()
+            ).limit(settings.BANK_RETIRED_KEEP).all()
+        else:
+            rows = [(q['question_text'], q.get('embedding')) for q in drawn]
+        stored = [np.frombuffer(vector, dtype=np.float32) for _, vector in rows if vector]
+        if stored: dedup.add(np.stack(stored))
+        dedup.add_texts([text for text, vector in rows if not vector])
+        return dedup
+
+    def schedule_replenish(self, file_hash: str) -> Optional[Job]:
+        if not settings.BANK_ENABLED: return None
+        return self._queue.submit("bank", file_hash, lambda job: self.replenish(file_hash, job))
+
+    def replenish(self, file_hash: str, job: Optional[Job] = None):
+        db = SessionLocal()
+        try:
+            index = ingestion_service.get_index(file_hash)
+            if not index: return
+            available = self.available(db, file_hash)
+            counts = DifficultyCount(**{
+                diff: max(settings.BANK_TARGET_PER_DIFFICULTY - available[diff], 0) for diff in DIFFICULTIES
+            })
+            if job: job.update("generating", 0.1)
+
+            # Seed dedup with what is banked, minus retired questions old enough to be deleted
+            self.prune_retired(db, file_hash)
+            dedup = self.dedup_index(db, file_hash) if settings.DEDUP_DOCUMENT_HISTORY else None
+            questions = generator_service.generate_questions(index, counts, dedup=dedup, raise_on_empty=False, background=True)
+
+            db.add_all([models.BankQuestion(file_hash=file_hash, **q) for q in map(self._bank_fields, questions)])
+            db.commit()
+        finally:
+            db.close()
+
+    def _bank_fields(self, q_data: Dict) -> Dict:
+        ref = q_data.get('reference_context', "")
+        return {
+            "question_text": q_data['question_text'], "options": q_data['options'],
+            "correct_answer": q_data['correct_answer'], "difficulty": q_data['difficulty'],
+            "explanation": q_data.get('explanation', ""), "reference_context": ref if isinstance(ref, str) else str(ref),
+            "embedding": np.asarray(q_data['embedding'], dtype=np.float32).tobytes() if q_data.get('embedding') is not None else None
+        }
+
+question_bank_service = QuestionBankService()
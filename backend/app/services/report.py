@@ -1,10 +1,22 @@
+import hashlib
+import io
 import os
-from datetime import datetime
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session, selectinload
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib import colors
 from app.core.config import settings
+from app.core.locks import FileLock
+from app.core.metrics import REPORT_SECONDS
+from app.db import models
+from app.db.session import SessionLocal
+from app.services.jobs import Job, JobQueue
 
 class ReportService:
     def __init__(self):
@@ -23,11 +35,112 @@ class ReportService:
             spaceAfter=10,
             textColor=colors.HexColor("#2E5B88")
         )
+        self._queue = JobQueue(settings.REPORT_WORKERS)
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()  # etag -> PDF bytes
+        self._cache_bytes = 0
+        self._loading: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
 
-    def generate_quiz_report(self, session_data: dict, questions: list, responses: list, proctor_logs: list) -> str:
-        report_filename = f"Report_{session_data['id']}.pdf"
-        report_path = settings.UPLOAD_DIR / report_filename
-        doc = SimpleDocTemplate(str(report_path), pagesize=letter)
+    def etag(self, db: Session, session: models.QuizSession) -> str:
+        """Fingerprint of everything the report shows; any change to the session yields a new report."""
+        responses = db.query(func.count(models.StudentResponse.id)).filter(models.StudentResponse.session_id == session.id).scalar()
+        state = "|".join(str(v) for v in (
+            session.id, session.test_name, session.status, session.total_score, session.max_score,
+            session.accuracy, session.completed_at, responses, session.violation_count
+        ))
+        return hashlib.sha256(state.encode()).hexdigest()[:32]
+
+    def get_pdf(self, db: Session, session: models.QuizSession, etag: Optional[str] = None) -> bytes:
+        """Cached PDF for the session's current state: memory, then disk, then a fresh render."""
+        etag = etag or self.etag(db, session)
+        cached = self._lookup(etag)
+        if cached is not None: return cached
+
+        # Single-flight: the background job and a first download must not both render the same report
+        with self._lock:
+            key_lock = self._loading.setdefault(session.id, threading.Lock())
+        try:
+            with key_lock:
+                cached = self._lookup(etag)
+                if cached is not None: return cached
+                report_path = settings.UPLOAD_DIR / f"Report_{session.id}_{etag[:16]}.pdf"
+                # The file lock extends single-flight to other worker processes; if it cannot be had, render without writing
+                file_lock = FileLock(settings.LOCK_DIR / f"report-{session.id}.lock")
+                locked = file_lock.acquire(settings.REPORT_LOCK_TIMEOUT)
+                try:
+                    if report_path.exists():
+                        pdf = report_path.read_bytes()
+                    else:
+                        pdf = self.generate_quiz_report(self._session_data(session), session.questions, session.responses, session.proctor_logs)
+                        if locked: self._write(report_path, pdf)
+                finally:
+                    file_lock.release()
+                # Without the lock nothing was written here; the path is recorded once some worker has written it
+                if locked or report_path.exists(): session.pdf_report_path = str(report_path)
+                self._store(etag, pdf)
+        finally:
+            # Also when rendering fails, so the per-session lock does not outlive the attempt
+            with self._lock:
+                self._loading.pop(session.id, None)
+        return pdf
+
+    def schedule(self, session_id: str) -> Job:
+        return self._queue.submit("report", session_id, lambda job: self._render_job(session_id))
+
+    def _render_job(self, session_id: str):
+        db = SessionLocal()
+        try:
+            session = db.query(models.QuizSession).options(
+                selectinload(models.QuizSession.questions), selectinload(models.QuizSession.responses),
+                selectinload(models.QuizSession.proctor_logs)
+            ).filter(models.QuizSession.id == session_id).first()
+            if not session: return
+            self.get_pdf(db, session)
+            db.commit()
+        finally:
+            db.close()
+
+    def _session_data(self, session: models.QuizSession) -> dict:
+        return {
+            "id": session.id, "test_name": session.test_name, "total_score": session.total_score,
+            "max_score": session.max_score, "accuracy": session.accuracy, "status": session.status,
+            "completed_at": session.completed_at
+        }
+
+    def _write(self, report_path, pdf: bytes):
+        # Atomic replace so a concurrent reader never sees a half-written PDF; older states are dropped
+        fd, tmp_path = tempfile.mkstemp(dir=settings.UPLOAD_DIR, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(pdf)
+        os.replace(tmp_path, report_path)
+        prefix = report_path.name.rsplit("_", 1)[0]
+        for stale in settings.UPLOAD_DIR.glob(f"{prefix}_*.pdf"):
+            if stale != report_path: stale.unlink(missing_ok=True)
+
+    def _lookup(self, etag: str) -> Optional[bytes]:
+        with self._lock:
+            pdf = self._cache.get(etag)
+            if pdf is not None: self._cache.move_to_end(etag)
+            return pdf
+
+    def _store(self, etag: str, pdf: bytes):
+        max_bytes = settings.REPORT_CACHE_MAX_MB * 1024 * 1024
+        with self._lock:
+            if etag in self._cache or len(pdf) > max_bytes: return
+            self._cache[etag] = pdf
+            self._cache_bytes += len(pdf)
+            while self._cache_bytes > max_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted)
+
+    def generate_quiz_report(self, session_data: dict, questions: list, responses: list, proctor_logs: list) -> bytes:
+        with REPORT_SECONDS.time():
+            buffer = io.BytesIO()
+            self._render(buffer, session_data, questions, responses, proctor_logs)
+            return buffer.getvalue()
+
+    def _render(self, target, session_data: dict, questions: list, responses: list, proctor_logs: list):
+        doc = SimpleDocTemplate(target, pagesize=letter)
         elements = []
 
         elements.append(Paragraph(f"Performance Report: {session_data.get('test_name', 'AI Quiz')}", self.header_style))
@@ -35,7 +148,7 @@ class ReportService:
 
         summary_data = [
             ["Session ID", session_data['id']],
-            ["Date", datetime.now().strftime("%Y-%m-%d %H:%M:%S")],
+            ["Date", session_data['completed_at'].strftime("%Y-%m-%d %H:%M:%S") if session_data.get('completed_at') else "-"],
             ["Total Score", f"{session_data['total_score']} / {session_data['max_score']}"],
             ["Accuracy", f"{session_data['accuracy']}%"],
             ["Status", session_data['status']]
@@ -91,6 +204,5 @@ class ReportService:
             elements.append(Spacer(1, 12))
 
         doc.build(elements)
-        return str(report_path)
 
 report_service = ReportService()
\ No newline at end of file
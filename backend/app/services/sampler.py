@@ -0,0 +1,37 @@
+import random
+import threading
+from typing import List
+
+class ContextSampler:
+    """Hands out windows of adjacent chunks so a generation run covers the whole document before repeating."""
+
+    def __init__(self, texts: List[str], window_size: int = 3):
+        self._texts = [text for text in texts if text and text.strip()]
+        self._window = max(1, min(window_size, len(self._texts) or 1))
+        self._rng = random.Random()
+        self._lock = threading.Lock()
+        self._pending: List[int] = []
+        self.cycles = 0
+
+    @classmethod
+    def from_index(cls, index, window_size: int) -> "ContextSampler":
+        # The index keeps chunks in document order, so neighbouring rows are neighbouring text
+        return cls(index.texts, window_size)
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def _refill(self):
+        # Stratified pass: split the document into consecutive windows at a random offset and visit them shuffled
+        offset = self._rng.randrange(self._window)
+        starts = list(range(offset - self._window if offset else 0, len(self._texts), self._window))
+        self._rng.shuffle(starts)
+        self._pending = starts
+        self.cycles += 1
+
+    def next_window(self) -> str:
+        if not self._texts: return ""
+        with self._lock:
+            if not self._pending: self._refill()
+            start = self._pending.pop()
+        return "\n\n".join(self._texts[max(start, 0):start + self._window])
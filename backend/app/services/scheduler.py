@@ -0,0 +1,80 @@
+import time
+from typing import Dict, Optional, Tuple
+from app.core.config import settings
+from app.schemas.dtos import DifficultyCount
+
+DIFFICULTIES = ["easy", "medium", "hard"]
+
+class AttemptScheduler:
+    """Decides which difficulty the next LLM call targets, within a global attempt budget and a wall-clock deadline.
+
+    Each difficulty's acceptance rate (accepted questions per requested question) is tracked as replies come back.
+    While the remaining budget covers every open slot at the observed rates, the difficulty expected to need the
+    most attempts goes first; once it cannot, attempts shift to the difficulties that actually yield questions.
+    """
+
+    def __init__(self, counts: DifficultyCount, deadline: Optional[float] = None, budget: Optional[int] = None):
+        self.targets = {diff: max(getattr(counts, diff), 0) for diff in DIFFICULTIES}
+        requested = sum(1 for n in self.targets.values() if n)
+        self.budget = budget or settings.GENERATION_ATTEMPT_BUDGET or settings.GENERATION_MAX_ATTEMPTS * requested
+        self.deadline = time.monotonic() + deadline if deadline else None
+        self.accepted = {diff: 0 for diff in DIFFICULTIES}
+        self.attempts = {diff: 0 for diff in DIFFICULTIES}
+        self.requested = {diff: 0 for diff in DIFFICULTIES}  # questions asked for in completed attempts
+        self.pending = {diff: 0 for diff in DIFFICULTIES}    # questions asked for in in-flight attempts
+        self.stop_reason: Optional[str] = None
+
+    @property
+    def used(self) -> int:
+        return sum(self.attempts.values())
+
+    def remaining_time(self) -> Optional[float]:
+        return None if self.deadline is None else max(self.deadline - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.stop_reason = self.stop_reason or "deadline"
+        return self.stop_reason == "deadline"
+
+    def rate(self, diff: str) -> float:
+        # Laplace-smoothed, so an unseen difficulty starts at 0.5 and one bad reply does not starve it
+        return (self.accepted[diff] + 1) / (self.requested[diff] + 2)
+
+    def open_slots(self, diff: str) -> int:
+        return self.targets[diff] - self.accepted[diff] - self.pending[diff]
+
+    def next_request(self) -> Optional[Tuple[str, int]]:
+        open_diffs = [diff for diff in DIFFICULTIES if self.open_slots(diff) > 0]
+        if not open_diffs or self.expired(): return None
+        if self.used >= self.budget:
+            self.stop_reason = self.stop_reason or "budget"
+            return None
+
+        expected = {diff: self.open_slots(diff) / (self.rate(diff) * settings.GENERATION_BATCH_SIZE) for diff in open_diffs}
+        if sum(expected.values()) <= self.budget - self.used:
+            diff = max(open_diffs, key=lambda d: expected[d])
+        else:
+            diff = max(open_diffs, key=self.rate)
+        count = min(self.open_slots(diff), settings.GENERATION_BATCH_SIZE)
+        self.attempts[diff] += 1
+        self.pending[diff] += count
+        return diff, count
+
+    def record(self, diff: str, count: int, accepted: int):
+        self.pending[diff] -= count
+        self.requested[diff] += count
+        self.accepted[diff] += accepted
+
+    def shortfall(self) -> DifficultyCount:
+        return DifficultyCount(**{diff: max(self.targets[diff] - self.accepted[diff], 0) for diff in DIFFICULTIES})
+
+    @property
+    def complete(self) -> bool:
+        return all(self.accepted[diff] >= self.targets[diff] for diff in DIFFICULTIES)
+
+    def summary(self) -> Dict:
+        return {
+            "status": "COMPLETE" if self.complete else "PARTIAL",
+            "reason": None if self.complete else (self.stop_reason or "exhausted"),
+            "attempts": self.used, "budget": self.budget,
+        }
@@ -0,0 +1,135 @@
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence
+import numpy as np
+
+MANIFEST = "manifest.json"
+EMBEDDINGS = "embeddings.npy"
+NODES = "nodes.jsonl"
+FORMAT_VERSION = 1
+
+class ScoredChunk(NamedTuple):
+    score: float
+    text: str
+    metadata: Dict
+
+class VectorStoreWriter:
+    """Appends embedding batches to disk as they are produced; the .npy header is written once the row count is known."""
+
+    def __init__(self, persist_dir: Path, dtype: str = "float32"):
+        self.persist_dir = persist_dir
+        self.dtype = np.dtype(dtype)
+        self.count = 0
+        self.dim: Optional[int] = None
+        persist_dir.mkdir(parents=True, exist_ok=True)
+        self._raw = open(persist_dir / f"{EMBEDDINGS}.part", "wb")
+        self._nodes = open(persist_dir / NODES, "w", encoding="utf-8")
+
+    def add(self, texts: Sequence[str], metadata: Sequence[Dict], embeddings: Sequence[Sequence[float]]):
+        if not texts: return
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if self.dim is None: self.dim = matrix.shape[1]
+        # Rows are unit-normalised on write so cosine similarity is a plain dot product at query time
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        self._raw.write((matrix / np.where(norms == 0, 1, norms)).astype(self.dtype).tobytes())
+        for text, meta in zip(texts, metadata):
+            self._nodes.write(json.dumps({"text": text, "metadata": meta}) + "\n")
+        self.count += len(texts)
+
+    def close(self, **manifest):
+        self._raw.close()
+        self._nodes.close()
+        raw_path = self.persist_dir / f"{EMBEDDINGS}.part"
+        with open(self.persist_dir / EMBEDDINGS, "wb") as out, open(raw_path, "rb") as raw:
+            header = {"descr": np.lib.format.dtype_to_descr(self.dtype), "fortran_order": False, "shape": (self.count, self.dim or 0)}
+            np.lib.format.write_array_header_1_0(out, header)
+            shutil.copyfileobj(raw, out)
+        raw_path.unlink()
+        with open(self.persist_dir / MANIFEST, "w", encoding="utf-8") as f:
+            json.dump({"version": FORMAT_VERSION, "count": self.count, "dim": self.dim, "dtype": self.dtype.name, **manifest}, f)
+
+    def abort(self):
+        self._raw.close()
+        self._nodes.close()
+
+class MmapVectorIndex:
+    """Read-only document index: a memory-mapped embedding matrix plus chunk texts in document order."""
+
+    def __init__(self, persist_dir: Path, embed_model=None):
+        self.persist_dir = persist_dir
+        self.embed_model = embed_model
+        with open(persist_dir / MANIFEST, encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        # Pages are faulted in on demand and shared between processes through the page cache
+        self.embeddings = np.load(persist_dir / EMBEDDINGS, mmap_mode="r")
+        self.texts: List[str] = []
+        self.metadata: List[Dict] = []
+        with open(persist_dir / NODES, encoding="utf-8") as f:
+            for line in f:
+                node = json.loads(line)
+                self.texts.append(node["text"])
+                self.metadata.append(node["metadata"])
+
+    @staticmethod
+    def exists(persist_dir: Path) -> bool:
+        return (persist_dir / MANIFEST).exists()
+
+    @staticmethod
+    def read_manifest(persist_dir: Path) -> Optional[Dict]:
+        try:
+            with open(persist_dir / MANIFEST, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def query(self, vector: Sequence[float], top_k: int = 5) -> List[ScoredChunk]:
+        if not len(self.texts) or top_k <= 0: return []
+        q = np.asarray(vector, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        scores = self.embeddings @ q.astype(self.embeddings.dtype)
+        top_k = min(top_k, len(scores))
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+        return [ScoredChunk(float(scores[i]), self.texts[i], self.metadata[i]) for i in top]
+
+    def retrieve(self, query_text: str, top_k: int = 5) -> List[ScoredChunk]:
+        return self.query(self.embed_model.get_query_embedding(query_text), top_k)
+
+def migrate_legacy_index(persist_dir: Path, embedder, dtype: str = "float32", **manifest) -> bool:
+    """Rewrite a LlamaIndex JSON-persisted index in place; returns False if persist_dir holds no legacy index."""
+    if not (persist_dir / "docstore.json").exists(): return False
+    from llama_index.core import StorageContext, load_index_from_storage
+    from llama_index.core.schema import MetadataMode
+    legacy = load_index_from_storage(StorageContext.from_defaults(persist_dir=persist_dir), embed_model=embedder)
+    nodes = list(legacy.docstore.docs.values())
+
+    tmp_dir = persist_dir.with_name(f".{persist_dir.name}.migrate.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    writer = VectorStoreWriter(tmp_dir, dtype)
+    try:
+        for start in range(0, len(nodes), 256):
+            batch = nodes[start:start + 256]
+            vectors = []
+            for node in batch:
+                try:
+                    vectors.append(legacy.vector_store.get(node.node_id))
+                except KeyError:
+                    vectors.append(embedder.get_text_embedding(node.get_content(metadata_mode=MetadataMode.EMBED)))
+            writer.add([node.get_content() for node in batch], [node.metadata for node in batch], vectors)
+        writer.close(**manifest)
+    except Exception:
+        writer.abort()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    # Swap directories so readers see either the old index or the complete new one
+    backup_dir = persist_dir.with_name(f".{persist_dir.name}.legacy.tmp")
+    os.replace(persist_dir, backup_dir)
+    os.replace(tmp_dir, persist_dir)
+    shutil.rmtree(backup_dir, ignore_errors=True)
+    return True
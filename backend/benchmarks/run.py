@@ -0,0 +1,258 @@
+"""Offline stage-level benchmarks for the quiz pipeline.
+
+Runs against the deterministic fake LLM and the hashing embedding stand-in, in a throwaway data directory.
+From backend/:
+
+    python -m benchmarks.run --out bench.json
+    python -m benchmarks.run --baseline bench.json --tolerance 0.25   # exit code 1 on regression
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+WORKDIR = Path(tempfile.mkdtemp(prefix="quizbench-"))
+# Must be set before anything under app/ is imported: settings are read at import time
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{WORKDIR / 'bench.db'}",
+    "UPLOAD_DIR": str(WORKDIR / "uploads"),
+    "INDEX_DIR": str(WORKDIR / "indices"),
+    "LOCK_DIR": str(WORKDIR / "locks"),
+    "MODEL_PATH": str(WORKDIR / "models" / "unused.gguf"),
+    "LLM_BACKEND": "fake",
+    "EMBEDDING_BACKEND": "hash",
+    "BANK_ENABLED": "false",
+})
+
+VOCABULARY = (
+    "process thread scheduler kernel memory page cache latency throughput network packet router protocol "
+    "database index query transaction lock replica gradient neuron layer tensor matrix vector entropy "
+    "compiler parser token grammar register pipeline branch predictor cluster shard consensus quorum"
+).split()
+
+def _sentences(rng: random.Random, count: int):
+    for _ in range(count):
+        words = rng.sample(VOCABULARY, 9)
+        yield f"The {words[0]} {words[1]} uses a {words[2]} to manage {words[3]} {words[4]} and {words[5]} under {words[6]} {words[7]} {words[8]}."
+
+def _timings(samples):
+    ordered = sorted(samples)
+    return {
+        "runs": len(samples),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+    }
+
+def _build_pdf(path: Path, pages: int):
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, PageBreak
+    rng = random.Random(7)
+    style = getSampleStyleSheet()["Normal"]
+    elements = []
+    for page in range(pages):
+        elements.append(Paragraph(f"Section {page + 1}", getSampleStyleSheet()["Heading2"]))
+        elements.extend(Paragraph(text, style) for text in _sentences(rng, 25))
+        elements.append(PageBreak())
+    SimpleDocTemplate(str(path), pagesize=letter).build(elements)
+
+def _messy_outputs(count: int):
+    from app.services.llm import FakeLLMBackend
+    llm = FakeLLMBackend()
+    rng = random.Random(11)
+    context = " ".join(_sentences(rng, 12))
+    outputs = []
+    for i in range(count):
+        raw = llm.complete(f"---------------------\n{context} {i}\n---------------------\nGenerate {1 + i % 3} DIFFERENT EASY MCQs")
+        kind = i % 6
+        if kind == 1: raw = f"Sure! Here are your questions:\n```json\n{raw}\n```\nGood luck."
+        elif kind == 2: raw = raw[: int(len(raw) * 0.8)]                                  # truncated reply
+        elif kind == 3: raw = raw.replace('"D": "None of the above."', '"D": ""')         # missing option
+        elif kind == 4: raw = raw.replace('"correct_answer": "A"', '"correct_answer": "E"')  # bad answer key
+        elif kind == 5: raw = "I cannot answer that from the context."                   # no JSON at all
+        outputs.append(raw)
+    return outputs
+
+def bench_ingestion(pages: int):
+    from app.services.ingestion import ingestion_service
+    pdf = WORKDIR / "bench.pdf"
+    _build_pdf(pdf, pages)
+    with open(pdf, "rb") as stream:
+        file_hash, file_path = ingestion_service.save_stream(pdf.name, stream)
+    started = time.perf_counter()
+    ingestion_service.create_index(file_hash, file_path)
+    elapsed = time.perf_counter() - started
+    return file_hash, {
+        "pages": pages, "seconds": round(elapsed, 4), "pages_per_sec": round(pages / elapsed, 3),
+        "bytes": file_path.stat().st_size,
+    }
+
+def bench_get_index(file_hash: str, runs: int):
+    from app.services.ingestion import ingestion_service
+    cold, warm = [], []
+    for _ in range(runs):
+        ingestion_service.index_cache.invalidate(file_hash)
+        started = time.perf_counter()
+        ingestion_service.get_index(file_hash)
+        cold.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        ingestion_service.get_index(file_hash)
+        warm.append(time.perf_counter() - started)
+    return {"cold": _timings(cold), "warm": _timings(warm)}
+
+def bench_retrieval(file_hash: str, runs: int):
+    from app.services.ingestion import ingestion_service
+    index = ingestion_service.get_index(file_hash)
+    rng = random.Random(3)
+    samples = []
+    for _ in range(runs):
+        query = " ".join(rng.sample(VOCABULARY, 4))
+        started = time.perf_counter()
+        index.retrieve(query, top_k=5)
+        samples.append(time.perf_counter() - started)
+    return _timings(samples)
+
+def bench_generation(file_hash: str, questions: int):
+    from app.schemas.dtos import DifficultyCount
+    from app.services.generator import generator_service
+    from app.services.ingestion import ingestion_service
+    index = ingestion_service.get_index(file_hash)
+    per_difficulty = max(questions // 3, 1)
+    started = time.perf_counter()
+    generated = generator_service.generate_questions(index, DifficultyCount(easy=per_difficulty, medium=per_difficulty, hard=per_difficulty), raise_on_empty=False)
+    elapsed = time.perf_counter() - started
+    return {"requested": per_difficulty * 3, "accepted": len(generated), "seconds": round(elapsed, 4), "questions_per_sec": round(len(generated) / elapsed, 3)}
+
+def bench_validation(corpus_size: int, repeats: int):
+    from app.services.generator import generator_service
+    corpus = _messy_outputs(corpus_size)
+    items = valid = 0
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for raw in corpus:
+            for item in generator_service._extract_items(raw):
+                items += 1
+                if generator_service._validate_and_repair(item): valid += 1
+    elapsed = time.perf_counter() - started
+    replies = corpus_size * repeats
+    return {
+        "replies": replies, "items": items, "valid_items": valid,
+        "replies_per_sec": round(replies / elapsed, 1), "items_per_sec": round(items / elapsed, 1),
+    }
+
+def bench_submit_and_report(file_hash: str, questions: int, runs: int):
+    import uuid
+    from app.api import endpoints
+    from app.db import models
+    from app.db.session import SessionLocal
+    from app.schemas import dtos
+    from app.services.report import report_service
+    rng = random.Random(5)
+    submit, report = [], []
+    db = SessionLocal()
+    # submit_quiz queues a background render; keep it from competing with the timed render below
+    schedule, report_service.schedule = report_service.schedule, lambda session_id: None
+    try:
+        for _ in range(runs):
+            session_id = str(uuid.uuid4())
+            db.add(models.QuizSession(id=session_id, file_hash=file_hash, test_name="Benchmark", config={}, status="ACTIVE"))
+            rows = [models.Question(
+                session_id=session_id, question_text=text, options={"A": "a", "B": "b", "C": "c", "D": "d"},
+                correct_answer="A", difficulty=("easy", "medium", "hard")[i % 3], explanation="Because.", reference_context=text
+            ) for i, text in enumerate(_sentences(rng, questions))]
+            db.add_all(rows)
+            db.add_all(models.ProctorLog(session_id=session_id, violation_type="TAB_SWITCH") for _ in range(2))
+            db.commit()
+            payload = dtos.QuizSubmission(session_id=session_id, answers=[
+                dtos.AnswerSubmission(question_id=q.id, selected_answer=rng.choice("ABCD")) for q in rows
+            ])
+            started = time.perf_counter()
+            endpoints.submit_quiz(payload, db)
+            submit.append(time.perf_counter() - started)
+
+            session = db.get(models.QuizSession, session_id)
+            started = time.perf_counter()
+            report_service.generate_quiz_report(
+                {"id": session.id, "test_name": session.test_name, "total_score": session.total_score,
+                 "max_score": session.max_score, "accuracy": session.accuracy, "status": session.status},
+                session.questions, session.responses, session.proctor_logs
+            )
+            report.append(time.perf_counter() - started)
+    finally:
+        report_service.schedule = schedule
+        db.close()
+    return {"questions": questions, "submit": _timings(submit), "report_render": _timings(report)}
+
+def compare(results: dict, baseline: dict, tolerance: float):
+    """Flag metrics that got worse by more than `tolerance`: *_ms and seconds up, *_per_sec down."""
+    regressions = []
+
+    def walk(current, previous, path):
+        for key, value in current.items():
+            old = previous.get(key) if isinstance(previous, dict) else None
+            if isinstance(value, dict):
+                walk(value, old or {}, f"{path}.{key}")
+            elif isinstance(value, (int, float)) and isinstance(old, (int, float)) and old > 0:
+                change = (value - old) / old
+                if (key.endswith("_ms") or key == "seconds") and change > tolerance or key.endswith("_per_sec") and -change > tolerance:
+                    regressions.append({"metric": f"{path}.{key}".lstrip("."), "baseline": old, "current": value, "change": round(change, 3)})
+
+    walk(results["stages"], baseline.get("stages", {}), "")
+    return regressions
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--questions", type=int, default=30)
+    parser.add_argument("--corpus", type=int, default=300)
+    parser.add_argument("--out", type=Path)
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from app.core.config import settings
+    from app.db.session import engine, init_db
+
+    stages = {}
+    try:
+        settings.create_dirs()
+        init_db()
+        file_hash, stages["ingestion"] = bench_ingestion(args.pages)
+        stages["get_index"] = bench_get_index(file_hash, args.runs)
+        stages["retrieval"] = bench_retrieval(file_hash, args.runs * 5)
+        stages["generation"] = bench_generation(file_hash, args.questions)
+        stages["validation"] = bench_validation(args.corpus, 5)
+        stages["submit"] = bench_submit_and_report(file_hash, args.questions, max(args.runs // 4, 3))
+    finally:
+        # The throwaway DB, uploads, indices and reports go with the run
+        engine.dispose()
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+    results = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(), "python": platform.python_version(),
+            "platform": platform.platform(), "cpu_count": os.cpu_count(), "args": {k: str(v) for k, v in vars(args).items()},
+        },
+        "stages": stages,
+    }
+    if args.baseline:
+        results["regressions"] = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+
+    output = json.dumps(results, indent=2)
+    if args.out: args.out.write_text(output)
+    print(output)
+    return 1 if results.get("regressions") else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
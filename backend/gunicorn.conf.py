@@ -0,0 +1,43 @@
+"""Multi-worker production serving. From backend/ (Linux/macOS):
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Workers coordinate through LOCK_DIR: index builds and report writes take per-file locks, ingestion job status is
+kept there so any worker can answer /upload/status, and LLM calls share LLM_GLOBAL_CONCURRENCY slots across every
+worker. Metrics at /metrics are per worker.
+"""
+import os
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Read by app settings when the app is preloaded below; a single process needs no cross-process LLM limit.
+# .env is loaded first so a value set there still wins over this default.
+load_dotenv(dotenv_path=Path(__file__).resolve().parent.parent / ".env")
+os.environ.setdefault("LLM_GLOBAL_CONCURRENCY", "4")
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(os.cpu_count() or 1, 4))))
+worker_class = "uvicorn_worker.UvicornWorker"
+# Import the app once in the master; workers fork from it and share its memory copy-on-write
+preload_app = True
+# Above GENERATION_DEADLINE_SECONDS, so a slow /generate returns its partial result instead of being killed
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+
+def when_ready(server):
+    # Runs in the master before any worker exists: schema upgrades happen once, not racing in every worker
+    from app.core.config import settings
+    from app.db.session import engine, init_db
+    settings.create_dirs()
+    init_db()
+    if settings.PRELOAD_EMBEDDINGS:
+        from app.services.ingestion import ingestion_service
+        ingestion_service.embed_model
+        server.log.info("Embedding model loaded in master; workers share it")
+    engine.dispose()
+
+def post_fork(server, worker):
+    # Pooled connections inherited from the master belong to it; each worker opens its own
+    from app.db.session import engine
+    engine.dispose(close=False)
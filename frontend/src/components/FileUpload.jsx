@@ -1,6 +1,6 @@
 import React, { useState } from 'react';
 import { Upload, FileText, CheckCircle, AlertCircle, Loader2 } from 'lucide-react';
-import { uploadFile } from '../services/api';
+import { uploadFile, getUploadStatus } from '../services/api';
 
 const FileUpload = ({ onUploadSuccess }) => {
   const [file, setFile] = useState(null);
@@ -8,6 +8,15 @@ const FileUpload = ({ onUploadSuccess }) => {
   const [error, setError] = useState('');
   const [success, setSuccess] = useState(false);
 
+  const waitForIndexing = async (jobId) => {
+    while (true) {
+      await new Promise((resolve) => setTimeout(resolve, 1500));
+      const job = await getUploadStatus(jobId);
+      if (job.status === 'COMPLETED') return;
+      if (job.status === 'FAILED') throw new Error(job.error || 'Failed to index content.');
+    }
+  };
+
   const allowedExtensions = ['.pdf', '.docx', '.pptx', '.txt'];
 
   const handleFileChange = (e) => {
@@ -33,10 +42,11 @@ const FileUpload = ({ onUploadSuccess }) => {
     setError('');
     try {
       const data = await uploadFile(file);
+      if (data.job_id && data.status !== 'COMPLETED') await waitForIndexing(data.job_id);
       setSuccess(true);
       onUploadSuccess(data.file_hash, file.name);
     } catch (err) {
-      setError(err.response?.data?.detail || 'Failed to upload and process file.');
+      setError(err.response?.data?.detail || err.message || 'Failed to upload and process file.');
       setFile(null);
     } finally {
       setLoading(false);
@@ -58,7 +68,7 @@ const FileUpload = ({ onUploadSuccess }) => {
 
         <h2 className="text-xl font-bold">Upload Study Material</h2>
         <p className="text-slate-500 text-sm">
-          Support for PDF, DOCX, PPTX, and TXT (Max 10MB)
+          Support for PDF, DOCX, PPTX, and TXT (Max 50MB)
         </p>
 
         {!success && (
@@ -6,6 +6,8 @@ import { getHistory, getHistoryDetail } from '../services/api';
 const HistoryDashboard = () => {
   const [history, setHistory] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const navigate = useNavigate();
 
   useEffect(() => {
@@ -16,6 +18,7 @@ const HistoryDashboard = () => {
     try {
       const data = await getHistory();
       setHistory(data.attempts);
+      setNextCursor(data.next_cursor);
     } catch (err) {
       console.error("Failed to load history", err);
     } finally {
@@ -23,6 +26,19 @@ const HistoryDashboard = () => {
     }
   };
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const data = await getHistory(nextCursor);
+      setHistory((prev) => [...prev, ...data.attempts]);
+      setNextCursor(data.next_cursor);
+    } catch (err) {
+      console.error("Failed to load more history", err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleViewAttempt = async (sessionId) => {
     try {
       const results = await getHistoryDetail(sessionId);
@@ -56,7 +72,7 @@ const HistoryDashboard = () => {
           </div>
         </div>
         <div className="bg-slate-100 px-4 py-1.5 rounded-full text-[10px] font-black text-slate-500 uppercase tracking-tighter">
-          {history.length} Saved Records
+          {history.length}{nextCursor ? '+' : ''} Saved Records
         </div>
       </div>
 
@@ -139,7 +155,18 @@ const HistoryDashboard = () => {
       
       <div className="flex flex-col items-center gap-4 py-10">
           <div className="h-px w-20 bg-slate-200"></div>
-          <p className="text-[10px] font-black text-slate-300 uppercase tracking-[0.3em]">End of Archive</p>
+          {nextCursor ? (
+            <button
+              onClick={loadMore}
+              disabled={loadingMore}
+              className="flex items-center gap-2 text-[10px] font-black text-blue-600 uppercase tracking-[0.3em] hover:text-blue-800 disabled:text-slate-300"
+            >
+              {loadingMore && <Loader2 className="animate-spin" size={12} />}
+              Load Older Attempts
+            </button>
+          ) : (
+            <p className="text-[10px] font-black text-slate-300 uppercase tracking-[0.3em]">End of Archive</p>
+          )}
       </div>
     </div>
   );
@@ -1,9 +1,9 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import { useLocation, useNavigate } from 'react-router-dom';
 import { Clock, ShieldCheck, Maximize, Send, ShieldAlert } from 'lucide-react';
 import QuestionCard from '../components/QuestionCard';
 import ProctorAlert from '../components/ProctorAlert';
-import { logProctorViolation, submitQuiz } from '../services/api';
+import { logProctorViolations, submitQuiz } from '../services/api';
 
 const QuizPage = () => {
   const location = useLocation();
@@ -40,15 +40,27 @@ const QuizPage = () => {
     }
   }, [sessionId, userAnswers, navigate, isSubmitting]);
 
-  const handleViolation = useCallback(async (type) => {
-    if (warningCount >= 3 || isSubmitting || !examStarted) return;
+  // A single tab switch fires blur, visibilitychange and fullscreenchange together; send them as one batch
+  const pendingViolations = useRef([]);
+  const flushTimer = useRef(null);
+
+  const flushViolations = useCallback(async () => {
+    flushTimer.current = null;
+    const types = pendingViolations.current.splice(0);
+    if (types.length === 0) return;
     try {
-      const response = await logProctorViolation(sessionId, type);
+      const response = await logProctorViolations(sessionId, types);
       setWarningCount(response.violation_count);
       setShowAlert(true);
-      if (response.violation_count >= 3) handleAutoSubmit();
+      if (response.session_status === 'AUTO_SUBMITTED') handleAutoSubmit();
     } catch (err) { console.error(err); }
-  }, [sessionId, warningCount, handleAutoSubmit, isSubmitting, examStarted]);
+  }, [sessionId, handleAutoSubmit]);
+
+  const handleViolation = useCallback((type) => {
+    if (warningCount >= 3 || isSubmitting || !examStarted) return;
+    pendingViolations.current.push(type);
+    if (!flushTimer.current) flushTimer.current = setTimeout(flushViolations, 250);
+  }, [warningCount, flushViolations, isSubmitting, examStarted]);
 
   const toggleFullscreen = () => {
     if (!document.fullscreenElement) {
@@ -18,6 +18,11 @@ export const uploadFile = async (file) => {
   return response.data;
 };
 
+export const getUploadStatus = async (jobId) => {
+  const response = await api.get(`/upload/status/${jobId}`);
+  return response.data;
+};
+
 export const generateQuiz = async (config) => {
   const response = await api.post('/generate', config);
   return response.data;
@@ -31,6 +36,14 @@ export const logProctorViolation = async (sessionId, violationType) => {
   return response.data;
 };
 
+export const logProctorViolations = async (sessionId, violationTypes) => {
+  const response = await api.post('/proctor/log/batch', {
+    session_id: sessionId,
+    violation_types: violationTypes,
+  });
+  return response.data;
+};
+
 export const submitQuiz = async (sessionId, answers) => {
   const response = await api.post('/submit', {
     session_id: sessionId,
@@ -39,8 +52,8 @@ export const submitQuiz = async (sessionId, answers) => {
   return response.data;
 };
 
-export const getHistory = async () => {
-  const response = await api.get('/history');
+export const getHistory = async (cursor = null) => {
+  const response = await api.get('/history', { params: cursor ? { cursor } : {} });
   return response.data;
 };
 